@@ -0,0 +1,150 @@
+"""
+Admission control for /analyze
+Tracks frames in flight on the full model and the recent model latency against a latency
+SLO. While both are within bounds frames go to the full model; under pressure new frames
+are served by a cheaper tier instead of queueing: a cached result, then the fallback
+detector, then a 429. A frame is still let through to the model whenever nothing is in
+flight, so the latency estimate recovers once the spike is over.
+"""
+import threading
+import time
+from collections import deque
+from inference_executor import ExecutorSaturated
+
+# 'skipped' frames were turned away by the frame quality gate before admission
+TIERS = ('full', 'cache', 'fallback', 'reject', 'skipped')
+
+# Why a frame was kept off the full model: in-flight cap, latency above the SLO, or a full executor queue
+SHED_REASONS = ('in_flight', 'latency', 'queue_full')
+
+class AdmissionRejected(ExecutorSaturated):
+    """Raised when every tier is saturated; answered with 429 like a full inference queue"""
+
+class Admission:
+    """Outcome of admit_full(): true when a slot was taken, otherwise reason is one of SHED_REASONS"""
+    __slots__ = ('reason',)
+
+    def __init__(self, reason=None):
+        self.reason = reason
+
+    def __bool__(self):
+        return self.reason is None
+
+ADMITTED = Admission()
+
+class AdmissionController:
+    """Chooses the serving tier for each frame from in-flight counts and recent model latency"""
+
+    def __init__(self, latency_slo_ms=500.0, percentile=95.0, window_seconds=10.0, max_in_flight=8,
+                 fallback_max_in_flight=16, retry_after_seconds=1, enabled=True, max_samples=512):
+        self.latency_slo = float(latency_slo_ms) / 1000.0
+        self.percentile = min(100.0, max(0.0, float(percentile)))
+        self.window_seconds = float(window_seconds)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.fallback_max_in_flight = max(0, int(fallback_max_in_flight))
+        self.retry_after_seconds = int(retry_after_seconds)
+        self.enabled = enabled
+
+        self.in_flight = 0
+        self.fallback_in_flight = 0
+        self.served = dict.fromkeys(TIERS, 0)
+        self.shed = dict.fromkeys(SHED_REASONS, 0)
+
+        self._samples = deque(maxlen=max(1, int(max_samples)))  # (finished_at, seconds) of full-model calls
+        self._lock = threading.Lock()
+
+    def _latency_estimate(self, now):
+        """Recent model latency at the configured percentile (0.0 without recent samples)."""
+        cutoff = now - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+
+        latencies = sorted(seconds for _, seconds in self._samples)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+        return latencies[index]
+
+    def latency_estimate(self):
+        """Recent model latency in seconds, as compared against the SLO."""
+        with self._lock:
+            return self._latency_estimate(time.monotonic())
+
+    def admit_full(self):
+        """
+        Take a full-model slot if the model is within its SLO; call finish_full() afterwards.
+        A refusal is falsy and carries its reason.
+        """
+        with self._lock:
+            if self.enabled:
+                if self.in_flight >= self.max_in_flight:
+                    return self._shed('in_flight')
+                if self.in_flight and self._latency_estimate(time.monotonic()) > self.latency_slo:
+                    return self._shed('latency')
+            self.in_flight += 1
+            return ADMITTED
+
+    def _shed(self, reason):
+        self.shed[reason] += 1
+        return Admission(reason)
+
+    def queue_full(self):
+        """Record a frame admitted here but refused by the full executor queue; returns the refusal."""
+        with self._lock:
+            return self._shed('queue_full')
+
+    def finish_full(self, seconds=None):
+        """Release a full-model slot, recording the model latency when the model actually ran."""
+        with self._lock:
+            self.in_flight -= 1
+            if seconds is not None:
+                self._samples.append((time.monotonic(), seconds))
+
+    def admit_fallback(self):
+        """Take a fallback-detector slot; call finish_fallback() afterwards."""
+        with self._lock:
+            if self.fallback_in_flight >= self.fallback_max_in_flight:
+                return False
+            self.fallback_in_flight += 1
+            return True
+
+    def finish_fallback(self):
+        with self._lock:
+            self.fallback_in_flight -= 1
+
+    def served_by(self, tier):
+        """Count a response served by tier."""
+        with self._lock:
+            self.served[tier] += 1
+
+    def reject(self, reason):
+        """Count a rejected frame and return the error to raise, worded after why the full model was shed."""
+        self.served_by('reject')
+        if reason == 'in_flight':
+            cause = f"{self.in_flight} frames in flight on the model (max {self.max_in_flight})"
+        elif reason == 'latency':
+            cause = (f"recent model latency {self.latency_estimate() * 1000:.0f} ms is above the "
+                     f"{self.latency_slo * 1000:.0f} ms SLO")
+        else:
+            cause = "the inference queue is full"
+        return AdmissionRejected(
+            f"Overloaded: {cause} and no cheaper tier is available",
+            self.retry_after_seconds
+        )
+
+    def stats(self):
+        """Return admission counters."""
+        with self._lock:
+            latency = self._latency_estimate(time.monotonic())
+            return {
+                'enabled': self.enabled,
+                'latency_slo_ms': round(self.latency_slo * 1000, 1),
+                'latency_estimate_ms': round(latency * 1000, 1),
+                'percentile': self.percentile,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'fallback_in_flight': self.fallback_in_flight,
+                'fallback_max_in_flight': self.fallback_max_in_flight,
+                'served': dict(self.served),
+                'shed': dict(self.shed)
+            }
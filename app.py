@@ -1,51 +1,36 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request
 from flask_cors import CORS
 import cv2
-import base64
 import numpy as np
 import random
 import logging
 import os
 import webbrowser
-import spotipy
 import threading
 import time
 from datetime import datetime
-from config import EMOTION_PLAYLISTS, SPOTIFY_CONFIG, AUTO_CAPTURE_SETTINGS, CAPTURED_IMAGE_PATH
-
-# Suppress TensorFlow warnings
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-
-# Default to fallback mode - try DeepFace only if explicitly available
-DEEPFACE_AVAILABLE = False
-
-# Try to import DeepFace only if TensorFlow is available
-try:
-    import tensorflow as tf
-    tf.get_logger().setLevel('ERROR')
-    
-    # Only try DeepFace if TensorFlow import succeeded
-    try:
-        from deepface import DeepFace
-        DEEPFACE_AVAILABLE = True
-        print("✅ DeepFace + TensorFlow loaded successfully")
-    except ImportError:
-        print("⚠️  DeepFace not available, using fallback")
-        
-except ImportError:
-    print("⚠️  TensorFlow not available, using fallback")
-except ImportError as e:
-    print(f"⚠️  DeepFace not available: {e}")
-    print("🔄 Using fallback emotion detection")
-    from emotion_fallback import FallbackEmotionDetector
-    DEEPFACE_AVAILABLE = False
+from config import EMOTION_PLAYLISTS, EMOTION_ALIASES, PLAYLIST_WEIGHTS, SPOTIFY_CONFIG, AUTO_CAPTURE_SETTINGS, CAPTURE_SETTINGS, DETECTOR_SETTINGS, BATCH_SETTINGS, WARMUP_SETTINGS, DEBUG_CAPTURE_SETTINGS, RESULT_CACHE_SETTINGS, INFERENCE_SETTINGS, ADMISSION_SETTINGS, QUALITY_SETTINGS, STREAM_SETTINGS, SESSION_SETTINGS, TRACK_CATALOG_SETTINGS, RECOMMENDER_SETTINGS
+from admission_control import AdmissionController, AdmissionRejected
+from camera_capture import FrameGrabber
+from capture_sink import DebugCaptureSink
+from detectors import backend_label, build_detector, resolve_backend
+from frame_quality import FrameQualityGate
+from frame_ingest import FrameDecodeError, decode_data_url, frame_from_request, frames_from_request
+from inference_executor import InferenceExecutor, ExecutorSaturated, InferenceTimeout
+from metrics import REGISTRY, stage_timer
+from playlist_index import PlaylistIndex
+from result_cache import ResultCache, perceptual_hash
+from session_state import RedisSessionBackend, SessionStateEngine, frame_signature
+from streaming import StreamManager, StreamLimitReached
+from track_catalog import TrackCatalog, create_spotify_client
+from track_features import TrackFeatureIndex
 
 def convert_to_json_serializable(obj):
     """Convert numpy types to JSON serializable Python types."""
-    if hasattr(obj, 'item'):  # numpy scalar
-        return obj.item()
-    elif hasattr(obj, 'tolist'):  # numpy array
+    if isinstance(obj, np.ndarray):  # numpy array (checked first: arrays also have .item)
         return obj.tolist()
+    elif hasattr(obj, 'item'):  # numpy scalar
+        return obj.item()
     elif isinstance(obj, dict):
         return {k: convert_to_json_serializable(v) for k, v in obj.items()}
     elif isinstance(obj, list):
@@ -62,174 +47,497 @@ logger = logging.getLogger(__name__)
 
 class DeepFaceEmotionSystem:
     def __init__(self):
-        self.current_emotion = None
-        self.songs_played = 0
         self.songs_before_recheck = AUTO_CAPTURE_SETTINGS['songs_before_recheck']
-        self.last_check_time = None
         self.auto_capture_enabled = AUTO_CAPTURE_SETTINGS['enabled']
         self.auto_capture_thread = None
         self.is_running = False
         
-        # Initialize fallback detector if DeepFace not available
-        if not DEEPFACE_AVAILABLE:
-            self.fallback_detector = FallbackEmotionDetector()
+        # Opened on the first auto-capture, not at import (gunicorn preloads the app)
+        self.frame_grabber = FrameGrabber(
+            CAPTURE_SETTINGS['source'],
+            buffer_size=CAPTURE_SETTINGS['buffer_size'],
+            max_fps=CAPTURE_SETTINGS['max_fps'],
+            reopen_seconds=CAPTURE_SETTINGS['reopen_seconds']
+        )
+        
+        # Model readiness: cold -> warming -> ready (or failed)
+        self.model_state = 'cold'
+        self.model_load_seconds = None
+        self.model_error = None
+        
+        # Detector does the actual analysis; the executor decides where it runs.
+        # Building it is cheap: heavy frameworks load with the model (warmup or first frame).
+        self.detector_name = resolve_backend(DETECTOR_SETTINGS['backend'])
+        self.detector_type = backend_label(self.detector_name)
+        self.detector = build_detector(self.detector_name)
+        
+        # Detectors that only need coarse statistics accept a cheaper (reduced grayscale) decode
+        self.decode_flags = getattr(self.detector, 'decode_flags', cv2.IMREAD_COLOR)
+        
+        self.executor = InferenceExecutor(
+            self.detector,
+            self.detector_name,
+            mode=INFERENCE_SETTINGS['mode'],
+            workers=INFERENCE_SETTINGS['workers'],
+            max_pending=INFERENCE_SETTINGS['max_pending'],
+            timeout_seconds=INFERENCE_SETTINGS['timeout_seconds'],
+            retry_after_seconds=INFERENCE_SETTINGS['retry_after_seconds'],
+            start_method=INFERENCE_SETTINGS['start_method'],
+            warmup_frame_size=WARMUP_SETTINGS['frame_size']
+        )
+        
+        # Frames the model would only turn into noise are answered without it
+        self.quality_gate = FrameQualityGate(
+            width=QUALITY_SETTINGS['width'],
+            min_brightness=QUALITY_SETTINGS['min_brightness'],
+            max_brightness=QUALITY_SETTINGS['max_brightness'],
+            min_contrast=QUALITY_SETTINGS['min_contrast'],
+            min_sharpness=QUALITY_SETTINGS['min_sharpness'],
+            max_motion=QUALITY_SETTINGS['max_motion'],
+            motion_window_seconds=QUALITY_SETTINGS['motion_window_seconds'],
+            enabled=QUALITY_SETTINGS['enabled']
+        )
+        
+        # Under pressure /analyze is served by cheaper tiers: cached result, fallback detector, 429
+        self.admission = AdmissionController(
+            latency_slo_ms=ADMISSION_SETTINGS['latency_slo_ms'],
+            percentile=ADMISSION_SETTINGS['percentile'],
+            window_seconds=ADMISSION_SETTINGS['window_seconds'],
+            max_in_flight=ADMISSION_SETTINGS['max_in_flight'],
+            fallback_max_in_flight=ADMISSION_SETTINGS['fallback_max_in_flight'],
+            retry_after_seconds=INFERENCE_SETTINGS['retry_after_seconds'],
+            enabled=ADMISSION_SETTINGS['enabled']
+        )
+        self.fallback_detector = self.detector if self.detector_name == 'fallback' else build_detector('fallback')
+        
+        # Recommendation lookups are precomputed once from config.py
+        self.playlist_index = PlaylistIndex(EMOTION_PLAYLISTS, EMOTION_ALIASES, PLAYLIST_WEIGHTS)
+        
+        # Per-session smoothed emotion, song counters and recheck gating
+        self.sessions = SessionStateEngine(
+            smoothing_alpha=SESSION_SETTINGS['smoothing_alpha'],
+            switch_margin=SESSION_SETTINGS['switch_margin'],
+            change_threshold=SESSION_SETTINGS['change_threshold'],
+            shards=SESSION_SETTINGS['shards'],
+            idle_timeout_seconds=SESSION_SETTINGS['idle_timeout_seconds'],
+            backend=self._create_session_backend(),
+            pinned=[SESSION_SETTINGS['default_session_id']]
+        )
+        
+        # Near-duplicate frames are answered from memory
+        self.result_cache = ResultCache(
+            ttl_seconds=RESULT_CACHE_SETTINGS['ttl_seconds'],
+            max_entries=RESULT_CACHE_SETTINGS['max_entries'],
+            enabled=RESULT_CACHE_SETTINGS['enabled']
+        )
+        
+        # Optional sampled frame dump; written in the background, never on the request path
+        self.capture_sink = DebugCaptureSink(
+            DEBUG_CAPTURE_SETTINGS['directory'],
+            enabled=DEBUG_CAPTURE_SETTINGS['enabled'],
+            sample_rate=DEBUG_CAPTURE_SETTINGS['sample_rate'],
+            max_queue=DEBUG_CAPTURE_SETTINGS['max_queue'],
+            max_files=DEBUG_CAPTURE_SETTINGS['max_files'],
+            jpeg_quality=DEBUG_CAPTURE_SETTINGS['jpeg_quality']
+        )
         
         # Initialize Spotify
         self.spotify_client = None
+        self.track_catalog = None
         self._initialize_spotify()
         
-        detector_type = "DeepFace" if DEEPFACE_AVAILABLE else "Fallback"
-        logger.info(f"Emotion System initialized with {detector_type} detector")
+        # Emotion-vector track recommendations (optional)
+        self.recommender = self._initialize_recommender()
+        
+        logger.info(f"Emotion System initialized with {self.detector_type} detector")
+        
+    def _create_session_backend(self):
+        """Shared session store for multi-worker deployments (optional)."""
+        if not SESSION_SETTINGS['store_url']:
+            return None
         
-    def _initialize_spotify(self):
-        """Initialize Spotify client for track information (optional)."""
         try:
-            # Skip Spotify authentication for demo - just use playlist URLs
-            self.spotify_client = None
+            backend = RedisSessionBackend(SESSION_SETTINGS['store_url'], SESSION_SETTINGS['store_ttl_seconds'])
+            logger.info("Session store enabled")
+            return backend
+        except Exception as e:
+            logger.error(f"Failed to initialize session store, keeping sessions per worker: {e}")
+            return None
+        
+    def _initialize_recommender(self):
+        """Memory-mapped track feature index for nearest-track recommendations (optional)."""
+        if not RECOMMENDER_SETTINGS['features_path']:
+            return None
+        
+        try:
+            recommender = TrackFeatureIndex(
+                RECOMMENDER_SETTINGS['features_path'],
+                nprobe=RECOMMENDER_SETTINGS['nprobe'],
+                approximate_min_tracks=RECOMMENDER_SETTINGS['approximate_min_tracks']
+            )
+            logger.info(f"Track recommender enabled ({recommender.size} tracks)")
+            return recommender
+        except Exception as e:
+            logger.error(f"Failed to load track features, using playlists only: {e}")
+            return None
+        
+    def _initialize_spotify(self):
+        """Initialize Spotify client and track catalog (optional)."""
+        if not TRACK_CATALOG_SETTINGS['enabled']:
             logger.info("Spotify client skipped - using direct playlist URLs")
+            return
+        
+        try:
+            self.spotify_client = create_spotify_client(
+                SPOTIFY_CONFIG,
+                pool_size=TRACK_CATALOG_SETTINGS['pool_size'],
+                timeout=TRACK_CATALOG_SETTINGS['request_timeout']
+            )
+            self.track_catalog = TrackCatalog(
+                self.spotify_client,
+                TRACK_CATALOG_SETTINGS['cache_path'],
+                ttl_seconds=TRACK_CATALOG_SETTINGS['ttl_seconds'],
+                refresh_interval_seconds=TRACK_CATALOG_SETTINGS['refresh_interval_seconds'],
+                page_size=TRACK_CATALOG_SETTINGS['page_size'],
+                max_tracks_per_playlist=TRACK_CATALOG_SETTINGS['max_tracks_per_playlist']
+            )
+            # Cached tracks are served immediately; missing or stale playlists are fetched in the background
+            self.track_catalog.load(
+                entry.playlist_id for entries in self.playlist_index.buckets.values() for entry in entries
+            )
+            logger.info("Spotify track catalog enabled")
         except Exception as e:
             logger.error(f"Failed to initialize Spotify: {e}")
             self.spotify_client = None
+            self.track_catalog = None
         
-    def analyze_emotion_from_base64(self, image_data):
-        """Analyze emotion from base64 image data using DeepFace or fallback."""
+    def warmup(self, forward_pass=True):
+        """
+        Load the emotion model and run it once on a dummy frame before serving traffic.
+        With forward_pass=False (preloading gunicorn master) only the weights are loaded;
+        each worker runs the dummy frame after the fork (gunicorn.conf.py post_worker_init).
+        """
+        if self.model_state == 'ready' or (self.model_state == 'loaded' and not forward_pass):
+            return True
         
-        # Use fallback detector if DeepFace not available
-        if not DEEPFACE_AVAILABLE:
-            return self.fallback_detector.analyze_emotion_from_base64(image_data)
+        self.model_state = 'warming'
+        self.model_error = None
+        start = time.perf_counter()
         
         try:
-            # Decode base64 image
-            image_data = image_data.split(',')[1]  # Remove data:image/jpeg;base64,
-            image_bytes = base64.b64decode(image_data)
-            
-            # Convert to numpy array
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                raise Exception("Could not decode image")
-            
-            # Save image for DeepFace analysis
-            cv2.imwrite(CAPTURED_IMAGE_PATH, img)
-            
-            # Analyze emotion using DeepFace
-            logger.info("Analyzing emotion with DeepFace...")
-            predictions = DeepFace.analyze(img, actions=['emotion'], enforce_detection=False)
-            
-            # Extract emotion data
-            if isinstance(predictions, list):
-                emotion_data = predictions[0]
-            else:
-                emotion_data = predictions
-            
-            dominant_emotion = emotion_data['dominant_emotion']
-            emotion_scores = emotion_data['emotion']
-            
-            # Convert all numpy types to JSON serializable Python types
-            emotion_scores_clean = convert_to_json_serializable(emotion_scores)
-            dominant_emotion_clean = str(dominant_emotion).lower()
+            self.executor.warmup(forward_pass=forward_pass)
             
-            # Round percentages
-            emotion_percentages = {k: round(float(v), 2) for k, v in emotion_scores_clean.items()}
-            
-            logger.info(f"DeepFace detected emotion: {dominant_emotion_clean}")
-            
-            return {
-                'dominant_emotion': dominant_emotion_clean,
-                'emotion_scores': emotion_percentages,
-                'success': True,
-                'detector': 'DeepFace',
-                'confidence': emotion_percentages.get(dominant_emotion_clean, 0.0)
-            }
+            self.model_load_seconds = round(time.perf_counter() - start + (self.model_load_seconds or 0.0), 3)
+            self.model_state = 'ready' if forward_pass else 'loaded'
+            logger.info(f"Emotion model {self.model_state} in {self.model_load_seconds}s")
+            return True
             
         except Exception as e:
-            logger.error(f"DeepFace emotion analysis failed: {e}")
-            # Fallback to random emotion if DeepFace fails
-            emotions = ['happy', 'sad', 'angry', 'neutral', 'fear']
-            fallback_emotion = random.choice(emotions)
-            
-            return {
-                'dominant_emotion': fallback_emotion,
-                'emotion_scores': {fallback_emotion: 85.0, 'neutral': 15.0},
+            self.model_state = 'failed'
+            self.model_error = str(e)
+            logger.error(f"Emotion model warmup failed: {e}")
+            return False
+    
+    def is_ready(self):
+        """True once the detector can serve requests without a cold start."""
+        return self.model_state in ('ready', 'lazy')
+    
+    def _failure_result(self, error):
+        """Random emotion used when a frame cannot be analyzed at all."""
+        logger.error(f"{self.detector_type} emotion analysis failed: {error}")
+        emotions = ['happy', 'sad', 'angry', 'neutral', 'fear']
+        fallback_emotion = random.choice(emotions)
+        
+        return {
+            'dominant_emotion': fallback_emotion,
+            'emotion_scores': {fallback_emotion: 85.0, 'neutral': 15.0},
+            'success': False,
+            'error': str(error),
+            'detector': 'Fallback (Random)',
+            'message': f'{self.detector_type} failed, using a random emotion: {fallback_emotion}'
+        }
+        
+    def analyze_emotion_from_base64(self, image_data, session=None):
+        """Analyze emotion from base64 image data with the configured detector or fallback."""
+        try:
+            img = decode_data_url(image_data, self.decode_flags)
+        except Exception as e:
+            return self._failure_result(e)
+        
+        if session is not None:
+            return self.analyze_for_session(session, img)
+        
+        skipped = self._quality_skip(img)
+        if skipped is not None:
+            return skipped
+        return self.analyze_emotion_from_frame(img)
+    
+    def analyze_for_session(self, session, img, multi_face=False):
+        """
+        Analyze a frame for a session: reuse the last result while the scene is unchanged and
+        fewer than songs_before_recheck songs have played, otherwise run the detector and smooth.
+        In multi-face mode the group emotion of all faces drives the session.
+        The result's 'tier' says what served it (see admission_control.py).
+        """
+        signature = frame_signature(img, SESSION_SETTINGS['signature_size'])
+        
+        with session.lock:
+            previous_signature = session.swap_previous_signature(signature, self.quality_gate.motion_window_seconds)
+        with stage_timer('quality'):
+            quality = self.quality_gate.check(img, signature, previous_signature)
+        if quality['reason'] is not None:
+            return self._served(self._skipped_result(session, quality, multi_face), 'skipped')
+        
+        with session.lock:
+            if not session.needs_inference(signature, self.songs_before_recheck, multi_face):
+                return self._served(session.reuse_result(), 'cache')
+        
+        admission = self.admission.admit_full()
+        if admission:
+            result = None
+            model_seconds = None
+            start = time.perf_counter()
+            try:
+                result = self.analyze_emotion_from_frame(img, multi_face)
+                if not result.get('cached'):
+                    model_seconds = time.perf_counter() - start
+            except InferenceTimeout:
+                model_seconds = time.perf_counter() - start
+                raise
+            except ExecutorSaturated:
+                if not self.admission.enabled:
+                    raise
+                # Queue filled up behind the admission check: degrade like any other overload
+                admission = self.admission.queue_full()
+            finally:
+                self.admission.finish_full(model_seconds)
+        
+            if result is not None:
+                return self._served(self._record(session, result, signature), 'cache' if result.get('cached') else 'full')
+        
+        return self._analyze_degraded(session, img, signature, admission.reason, multi_face)
+        
+    def _analyze_degraded(self, session, img, signature, reason, multi_face=False):
+        """Cheaper tiers for a frame the full model cannot take in time: cached result, fallback detector, 429."""
+        with stage_timer('cache_lookup'):
+            key = self._cache_key(img, multi_face)
+            cached = self.result_cache.get(key) if key is not None else None
+        if cached is not None:
+            return self._served(self._record(session, cached, signature), 'cache')
+        
+        with session.lock:
+            if session.has_recent_result(ADMISSION_SETTINGS['cache_max_age_seconds'], multi_face):
+                return self._served(session.reuse_result(), 'cache')
+        
+        if self.admission.admit_fallback():
+            try:
+                with stage_timer('fallback'):
+                    detector = self.fallback_detector
+                    result = detector.analyze_faces(img) if multi_face else detector.analyze_emotion_from_frame(img)
+            finally:
+                self.admission.finish_fallback()
+            # Heuristic answer for this frame only: it is not blended into the session's smoothed emotion
+            return self._served(dict(result), 'fallback')
+        
+        raise self.admission.reject(reason)
+        
+    def _quality_skip(self, img):
+        """
+        Gate a frame that has no session (so no previous frame for the motion check):
+        the skipped result if it should not reach the model, else None.
+        """
+        with stage_timer('quality'):
+            quality = self.quality_gate.check(img)
+        if quality['reason'] is None:
+            return None
+        return self._served(self._skipped_result(None, quality), 'skipped')
+    
+    def _skipped_result(self, session, quality, multi_face=False):
+        """Answer for a frame that failed the quality gate: the session's last result, else no emotion."""
+        logger.info(f"Frame skipped by quality gate: {quality['reason']}")
+        
+        result = None
+        current_emotion = None
+        if session is not None:
+            with session.lock:
+                if session.has_recent_result(float('inf'), multi_face):
+                    result = session.reuse_result()
+                current_emotion = session.current_emotion
+        
+        if result is None:
+            result = {
+                'dominant_emotion': current_emotion or 'neutral',
+                'emotion_scores': {},
                 'success': False,
-                'error': str(e),
-                'detector': 'Fallback (Random)',
-                'message': f'DeepFace failed, using fallback: {fallback_emotion}'
+                'detector': self.detector_type,
+                'confidence': 0.0,
+                'face_detected': False,
+                'message': f"Frame skipped: {quality['reason'].replace('_', ' ')}"
             }
+        
+        result['frame_quality'] = quality
+        return result
     
-    def get_random_song_from_playlist(self, playlist_url):
-        """For demo: return playlist URL directly (no Spotify API needed)."""
+    def _record(self, session, result, signature):
+        with session.lock:
+            result = session.record_analysis(result, signature)
+        self.sessions.save(session)
+        return result
+        
+    def _served(self, result, tier):
+        result['tier'] = tier
+        self.admission.served_by(tier)
+        return result
+    
+    def _cache_key(self, img, multi_face=False):
+        """Perceptual hash used as the result-cache key (None when caching is off)."""
+        if not self.result_cache.enabled:
+            return None
+        key = perceptual_hash(img, RESULT_CACHE_SETTINGS['hash_size'])
+        # Single- and multi-face results for the same frame are cached separately
+        return ('faces', key) if multi_face else key
+    
+    def _remember(self, key, result):
+        """Cache successful results only, so failures are retried."""
+        if key is not None and result.get('success'):
+            self.result_cache.put(key, result)
+        return result
+    
+    def analyze_emotion_from_frame(self, img, multi_face=False):
+        """
+        Analyze emotion from an already decoded BGR frame, answering near-duplicates from the cache.
+        With multi_face every face is analyzed and the group emotion is returned as the dominant one.
+        Raises ExecutorSaturated / InferenceTimeout when the inference executor is overloaded.
+        """
         try:
-            # For demo purposes, just return the playlist URL
-            # In production, this would extract individual tracks
-            return {
-                'url': playlist_url,
-                'name': f'Random song from {playlist_url.split("/")[-1][:8]}... playlist',
-                'artist': 'Various Artists',
-                'type': 'playlist'
-            }
-            
+            with stage_timer('cache_lookup'):
+                key = self._cache_key(img, multi_face)
+                cached = self.result_cache.get(key) if key is not None else None
         except Exception as e:
-            logger.error(f"Failed to process playlist: {e}")
-            return {'url': playlist_url, 'type': 'playlist'}
+            return self._failure_result(e)
+        
+        if cached is not None:
+            return cached
+        
+        self.capture_sink.offer(img)
+        with stage_timer('inference'):
+            result = self.executor.analyze_faces(img) if multi_face else self.executor.analyze(img)
+        return self._remember(key, result)
     
-    def get_playlist_for_emotion(self, emotion):
-        """Get a random playlist and optionally a random song for the given emotion."""
-        if emotion not in EMOTION_PLAYLISTS:
-            emotion = 'neutral'
+    def analyze_emotion_batch(self, images):
+        """
+        Analyze several frames (decoded arrays or base64 data URLs) as one unit of inference work.
+        Frames that fail the quality gate are answered as skipped and never reach the model.
+        """
+        frames = [None] * len(images)
+        results = [None] * len(images)
+        keys = [None] * len(images)
+        
+        for index, image in enumerate(images):
+            try:
+                frames[index] = decode_data_url(image, self.decode_flags) if isinstance(image, str) else image
+                results[index] = self._quality_skip(frames[index])
+                if results[index] is not None:
+                    continue
+                keys[index] = self._cache_key(frames[index])
+                if keys[index] is not None:
+                    results[index] = self.result_cache.get(keys[index])
+            except Exception as e:
+                results[index] = self._failure_result(e)
         
-        playlists = EMOTION_PLAYLISTS[emotion]
-        selected_playlist = random.choice(playlists)
+        todo = [index for index, result in enumerate(results) if result is None]
+        if todo:
+            for index in todo:
+                self.capture_sink.offer(frames[index])
+            
+            with stage_timer('inference_batch'):
+                analyzed = self.executor.analyze_batch([frames[index] for index in todo])
+            for index, result in zip(todo, analyzed):
+                results[index] = self._remember(keys[index], result)
+        
+        return results
+    
+    def get_random_song_from_playlist(self, entry):
+        """Random track from the cached catalog; the playlist itself until its tracks are fetched."""
+        if self.track_catalog is not None:
+            track = self.track_catalog.random_track(entry.playlist_id)
+            if track is not None:
+                return {
+                    'url': track['url'],
+                    'name': track['name'],
+                    'artist': track['artist'],
+                    'type': 'track'
+                }
+        
+        return {
+            'url': entry.url,
+            'name': entry.name,
+            'artist': entry.artist,
+            'type': entry.type
+        }
+    
+    def get_session(self, session_id=None):
+        """Session state for a client; the auto-capture loop and ID-less clients share the default session."""
+        return self.sessions.get(session_id or SESSION_SETTINGS['default_session_id'])
+    
+    def get_playlist_for_emotion(self, emotion, session=None, emotion_scores=None):
+        """
+        Get a random playlist and optionally a song for the given emotion.
+        With the track recommender, the song is the nearest track to the whole score vector.
+        """
+        session = session or self.get_session()
+        emotion_scores = emotion_scores or {emotion: 100.0}
+        
+        # Unknown or unmapped labels (e.g. 'surprise') resolve through the alias map
+        with session.lock:
+            entry = self.playlist_index.choose(emotion, session.playlist_cursor)
+            songs_played = session.songs_played
+            session.record_song(entry.emotion)
+        self.sessions.save(session)
+        
+        emotion = entry.emotion
+        selected_playlist = entry.url
         
         result = {
             'playlist_url': selected_playlist,
             'emotion': emotion,
-            'songs_played': self.songs_played
+            'songs_played': songs_played
         }
         
         # Get random song if enabled
         if AUTO_CAPTURE_SETTINGS['auto_play_random_song']:
-            song_info = self.get_random_song_from_playlist(selected_playlist)
-            if isinstance(song_info, dict) and 'url' in song_info:
-                result['song_url'] = song_info['url']
-                result['song_name'] = song_info.get('name', 'Random Song')
-                result['song_artist'] = song_info.get('artist', 'Unknown Artist')
-                result['play_type'] = song_info.get('type', 'track')
+            if self.recommender is not None:
+                song_info = self.recommender.recommend(emotion_scores, RECOMMENDER_SETTINGS['top_k'])
+                song_info['type'] = 'track'
+                result['music_target'] = song_info['target']
             else:
-                result['song_url'] = selected_playlist
-                result['play_type'] = 'playlist'
-        
-        self.songs_played += 1
-        self.current_emotion = emotion
-        self.last_check_time = datetime.now()
+                song_info = self.get_random_song_from_playlist(entry)
+            result['song_url'] = song_info['url']
+            result['song_name'] = song_info.get('name', 'Random Song')
+            result['song_artist'] = song_info.get('artist', 'Unknown Artist')
+            result['play_type'] = song_info.get('type', 'track')
         
         return result
     
-    def auto_capture_and_analyze(self):
-        """Automatically capture from webcam and analyze emotion."""
+    def auto_capture_and_analyze(self, session=None):
+        """Analyze the newest frame from the capture source."""
         try:
-            # Initialize webcam
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                logger.error("Could not open webcam for auto-capture")
-                return None
+            # The device stays open between samples; frames reach the detector as raw arrays
+            self.frame_grabber.start()
+            frame = self.frame_grabber.latest(
+                timeout=CAPTURE_SETTINGS['frame_timeout_seconds'],
+                max_age_seconds=CAPTURE_SETTINGS['max_frame_age_seconds']
+            )
             
-            # Capture frame
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
-                logger.error("Failed to capture frame")
+            if frame is None:
+                logger.error(f"No frame from capture source {CAPTURE_SETTINGS['source']}")
                 return None
             
-            # Convert frame to base64
-            _, buffer = cv2.imencode('.jpg', frame)
-            img_base64 = base64.b64encode(buffer).decode('utf-8')
-            img_data_url = f"data:image/jpeg;base64,{img_base64}"
-            
             # Analyze emotion
-            result = self.analyze_emotion_from_base64(img_data_url)
+            if session is not None:
+                result = self.analyze_for_session(session, frame)
+            else:
+                result = self.analyze_emotion_from_frame(frame)
             
             if result['success']:
                 logger.info(f"Auto-captured emotion: {result['dominant_emotion']}")
@@ -245,33 +553,48 @@ class DeepFaceEmotionSystem:
         """Start automatic emotion capture and music recommendation."""
         if self.auto_capture_enabled and not self.is_running:
             self.is_running = True
+            self.frame_grabber.start()
             self.auto_capture_thread = threading.Thread(target=self._auto_capture_loop, daemon=True)
             self.auto_capture_thread.start()
             logger.info("Auto-capture started")
     
     def stop_auto_capture(self):
-        """Stop automatic emotion capture."""
+        """Stop automatic emotion capture and release the capture device."""
         self.is_running = False
         if self.auto_capture_thread:
             self.auto_capture_thread.join(timeout=5)
+        self.frame_grabber.stop()
         logger.info("Auto-capture stopped")
     
     def _auto_capture_loop(self):
         """Main loop for automatic capture and music recommendation."""
+        session = self.get_session()
+        
         while self.is_running:
             try:
-                # Auto-capture and analyze
-                result = self.auto_capture_and_analyze()
+                # Only capture and analyze once songs_before_recheck songs have played
+                with session.lock:
+                    due = session.due_for_recheck(self.songs_before_recheck)
+                    emotion = session.current_emotion
+                    songs_since_check = session.songs_since_check
+                
+                if due:
+                    result = self.auto_capture_and_analyze(session)
+                    emotion = result['dominant_emotion'] if result and result['success'] else None
+                    scores = result.get('smoothed_scores') if emotion else None
+                else:
+                    scores = None
+                    logger.info(f"Skipping recheck ({songs_since_check}/{self.songs_before_recheck} songs played)")
                 
-                if result and result['success']:
+                if emotion:
                     # Get music recommendation
-                    music_info = self.get_playlist_for_emotion(result['dominant_emotion'])
+                    music_info = self.get_playlist_for_emotion(emotion, session, scores)
                     
                     # Open music in browser
                     music_url = music_info.get('song_url', music_info.get('playlist_url'))
                     if music_url:
                         webbrowser.open(music_url)
-                        logger.info(f"Auto-opened music for {result['dominant_emotion']} emotion")
+                        logger.info(f"Auto-opened music for {emotion} emotion")
                 
                 # Wait for next capture
                 time.sleep(AUTO_CAPTURE_SETTINGS['interval_seconds'])
@@ -283,6 +606,132 @@ class DeepFaceEmotionSystem:
 # Global system instance
 emotion_system = DeepFaceEmotionSystem()
 
+# Continuous webcam sessions: latest-frame-wins analysis, events only on emotion changes
+# Frames take the /analyze path (quality gate, admission, scene reuse) on the client's own session
+stream_manager = StreamManager(
+    lambda img, session_id: emotion_system.analyze_for_session(emotion_system.get_session(session_id), img),
+    on_change=lambda session_id, emotion: convert_to_json_serializable(
+        emotion_system.get_playlist_for_emotion(emotion, emotion_system.get_session(session_id))
+    ),
+    smoothing_alpha=STREAM_SETTINGS['smoothing_alpha'],
+    switch_margin=STREAM_SETTINGS['switch_margin'],
+    idle_timeout_seconds=STREAM_SETTINGS['idle_timeout_seconds'],
+    max_sessions=STREAM_SETTINGS['max_sessions'],
+    max_listeners=STREAM_SETTINGS['max_listeners']
+)
+
+# Load model weights at import time so gunicorn's preload_app shares them copy-on-write;
+# a preloading master stops short of the forward pass, which each worker runs after forking
+if WARMUP_SETTINGS['on_startup']:
+    emotion_system.warmup(forward_pass=not WARMUP_SETTINGS['defer_forward_pass'])
+else:
+    emotion_system.model_state = 'lazy'  # Model loads inside the first request
+
+def register_metrics():
+    """Expose executor, model, cache and session state as scrape-time gauges."""
+    stats = emotion_system.executor.stats
+    REGISTRY.gauge('emotion_inference_queue_depth', 'Frames accepted but not yet analyzed',
+                   emotion_system.executor.queue_depth)
+    REGISTRY.gauge('emotion_inference_max_pending', 'Frames allowed in flight before 429',
+                   lambda: emotion_system.executor.max_pending)
+    REGISTRY.gauge('emotion_inference_completed_total', 'Inference calls that returned a usable result',
+                   lambda: stats()['completed'], kind='counter')
+    REGISTRY.gauge('emotion_inference_failed_total', 'Inference calls that raised or returned a detector error',
+                   lambda: stats()['failed'], kind='counter')
+    REGISTRY.gauge('emotion_inference_rejected_total', 'Frames rejected with 429',
+                   lambda: stats()['rejected'], kind='counter')
+    REGISTRY.gauge('emotion_inference_timeouts_total', 'Frames that timed out with 503',
+                   lambda: stats()['timeouts'], kind='counter')
+    quality = emotion_system.quality_gate.stats
+    REGISTRY.gauge('emotion_frame_quality_checked_total', 'Frames checked by the quality gate',
+                   lambda: quality()['checked'], kind='counter')
+    REGISTRY.gauge('emotion_frame_quality_rejected_total', 'Frames kept from the model by the quality gate',
+                   lambda: quality()['rejected'], label_name='reason', kind='counter')
+    admission = emotion_system.admission.stats
+    REGISTRY.gauge('emotion_admission_served_total', 'Analyzed frames by the tier that served them',
+                   lambda: admission()['served'], label_name='tier', kind='counter')
+    REGISTRY.gauge('emotion_admission_shed_total', 'Frames kept off the full model by the reason they were shed',
+                   lambda: admission()['shed'], label_name='reason', kind='counter')
+    REGISTRY.gauge('emotion_admission_in_flight', 'Frames on the full model admitted by admission control',
+                   lambda: emotion_system.admission.in_flight)
+    REGISTRY.gauge('emotion_admission_latency_seconds', 'Recent full-model latency compared against the SLO',
+                   emotion_system.admission.latency_estimate)
+    REGISTRY.gauge('emotion_detector_info', 'Emotion detector in use',
+                   lambda: {emotion_system.detector_type: 1}, label_name='detector')
+    REGISTRY.gauge('emotion_inference_mode_info', 'Inference executor mode',
+                   lambda: {emotion_system.executor.mode: 1}, label_name='mode')
+    REGISTRY.gauge('emotion_model_ready', '1 once the emotion model is warm',
+                   lambda: 1 if emotion_system.is_ready() else 0)
+    REGISTRY.gauge('emotion_model_load_seconds', 'Time taken to load and warm the emotion model',
+                   lambda: emotion_system.model_load_seconds)
+    
+    cache = emotion_system.result_cache.stats
+    REGISTRY.gauge('emotion_result_cache_hits_total', 'Result-cache hits', lambda: cache()['hits'], kind='counter')
+    REGISTRY.gauge('emotion_result_cache_misses_total', 'Result-cache misses', lambda: cache()['misses'], kind='counter')
+    REGISTRY.gauge('emotion_result_cache_evictions_total', 'Result-cache LRU evictions',
+                   lambda: cache()['evictions'], kind='counter')
+    REGISTRY.gauge('emotion_result_cache_entries', 'Entries in the result cache', lambda: cache()['entries'])
+    
+    sessions = emotion_system.sessions.stats
+    REGISTRY.gauge('emotion_sessions', 'Known client sessions', lambda: sessions()['sessions'])
+    REGISTRY.gauge('emotion_session_evictions_total', 'Sessions dropped after the idle timeout',
+                   lambda: sessions()['evictions'], kind='counter')
+    REGISTRY.gauge('emotion_session_store_errors_total', 'Failed session store reads and writes',
+                   lambda: sessions()['backend_errors'], kind='counter')
+    capture = emotion_system.frame_grabber.stats
+    REGISTRY.gauge('emotion_capture_frames_total', 'Frames read from the auto-capture source',
+                   lambda: capture()['frames_captured'], kind='counter')
+    REGISTRY.gauge('emotion_capture_frames_dropped_total', 'Captured frames replaced before being analyzed',
+                   lambda: capture()['frames_dropped'], kind='counter')
+    REGISTRY.gauge('emotion_stream_sessions', 'Open streaming sessions',
+                   lambda: stream_manager.stats()['active_sessions'])
+    REGISTRY.gauge('emotion_stream_listeners', 'Open event streams (each holds a worker thread)',
+                   lambda: stream_manager.listeners)
+    # Metrics are per process; the pid shows which worker answered a scrape
+    REGISTRY.gauge('emotion_process_info', 'Process that served this scrape',
+                   lambda: {os.getpid(): 1}, label_name='pid')
+
+register_metrics()
+
+REQUEST_SECONDS = REGISTRY.histogram('emotion_request_seconds', 'End-to-end request latency', label_name='endpoint')
+RESPONSES = REGISTRY.counter('emotion_responses_total', 'Responses by HTTP status', label_name='status')
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None and request.endpoint != 'metrics':
+        REQUEST_SECONDS.observe(time.perf_counter() - start, request.endpoint or 'unknown')
+        RESPONSES.inc(str(response.status_code))
+    return response
+
+def request_session():
+    """Session state for the calling client (X-Session-ID header or session_id query parameter)."""
+    session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+    return emotion_system.get_session(session_id)
+
+def multi_face_requested():
+    """Multi-face mode from the multi_face query parameter or JSON field."""
+    value = request.args.get('multi_face')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('multi_face')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def overloaded_response(error):
+    """429 when the inference queue is full, 503 when inference timed out; both ask the client to retry."""
+    status = 429 if isinstance(error, ExecutorSaturated) else 503
+    logger.warning(f"Inference overloaded ({status}): {error}")
+    
+    body = {'error': str(error), 'retry_after': error.retry_after}
+    if isinstance(error, AdmissionRejected):
+        body['tier'] = 'reject'
+    response = jsonify(body)
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, status
+
 @app.route('/')
 def index():
     """Serve the main web interface."""
@@ -295,30 +744,179 @@ def camera_test():
 
 @app.route('/analyze', methods=['POST'])
 def analyze_emotion():
-    """Analyze emotion from uploaded image."""
+    """Analyze emotion from an uploaded image (JPEG/PNG body, multipart, raw pixels or JSON data URL)."""
     try:
-        data = request.get_json()
-        image_data = data.get('image')
+        img = frame_from_request(request, emotion_system.decode_flags)
         
-        if not image_data:
+        if img is None:
             return jsonify({'error': 'No image data provided'}), 400
         
-        # Analyze emotion using DeepFace
-        result = emotion_system.analyze_emotion_from_base64(image_data)
+        session = request_session()
         
-        # Get music recommendation
-        music_info = emotion_system.get_playlist_for_emotion(result['dominant_emotion'])
-        result.update(music_info)
+        # Analyze emotion with the configured detector (skipped while the scene is unchanged)
+        result = emotion_system.analyze_for_session(session, img, multi_face_requested())
+        
+        # Get music recommendation (not for an unusable frame with no emotion to go on:
+        # the client keeps its current song and the session's song count is left alone)
+        if result['tier'] != 'skipped' or result['success']:
+            with stage_timer('playlist'):
+                music_info = emotion_system.get_playlist_for_emotion(
+                    result['dominant_emotion'], session, result.get('smoothed_scores') or result.get('emotion_scores')
+                )
+            result.update(music_info)
         
         # Ensure all data is JSON serializable
-        result_clean = convert_to_json_serializable(result)
+        with stage_timer('serialize'):
+            result_clean = convert_to_json_serializable(result)
         
         return jsonify(result_clean)
         
+    except (FrameDecodeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except (ExecutorSaturated, InferenceTimeout) as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Analysis endpoint error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_emotion_batch():
+    """Analyze emotion for many frames in one request."""
+    try:
+        images = frames_from_request(request, emotion_system.decode_flags)
+        
+        if not images:
+            return jsonify({'error': 'No images provided'}), 400
+        
+        if len(images) > BATCH_SETTINGS['max_request_images']:
+            return jsonify({'error': f"Too many images (max {BATCH_SETTINGS['max_request_images']})"}), 400
+        
+        results = emotion_system.analyze_emotion_batch(images)
+        
+        return jsonify(convert_to_json_serializable({
+            'results': results,
+            'count': len(results)
+        }))
+        
+    except FrameDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    except (ExecutorSaturated, InferenceTimeout) as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Batch analysis endpoint error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/recommend', methods=['POST'])
+def recommend_tracks():
+    """Nearest tracks for one or many emotion score vectors (batched in one index query)."""
+    if emotion_system.recommender is None:
+        return jsonify({'error': 'Track recommender not configured (set TRACK_FEATURES_PATH)'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    queries = data.get('emotion_scores')
+    single = isinstance(queries, dict)
+    if single:
+        queries = [queries]
+    if not queries or not isinstance(queries, list) or not all(isinstance(q, dict) for q in queries):
+        return jsonify({'error': 'emotion_scores must be a score dict or a list of them'}), 400
+    if len(queries) > BATCH_SETTINGS['max_request_images']:
+        return jsonify({'error': f"Too many queries (max {BATCH_SETTINGS['max_request_images']})"}), 400
+    
+    try:
+        k = max(1, min(int(data.get('k', 10)), RECOMMENDER_SETTINGS['max_query_k']))
+        with stage_timer('recommend'):
+            results = emotion_system.recommender.nearest_tracks(queries, k)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'tracks': results[0]} if single else {'results': results, 'count': len(results)})
+
+STREAMING_UNAVAILABLE = ('Streaming sessions need a single gunicorn worker (WEB_CONCURRENCY=1) '
+                         'or sticky routing per session ID (STREAM_ENABLED=true)')
+
+def stream_client_id():
+    """Client session a stream belongs to (X-Session-ID header or session_id query parameter), validated."""
+    session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+    if session_id:
+        emotion_system.get_session(session_id)  # Raises ValueError for malformed IDs
+    return session_id
+
+def streaming_unavailable():
+    """501 when stream sessions could be split across workers (see STREAM_ENABLED in config.py)."""
+    return jsonify({'error': STREAMING_UNAVAILABLE}), 501
+
+@app.route('/stream/<session_id>/frame', methods=['POST'])
+def stream_frame(session_id):
+    """Push a frame into a streaming session; returns immediately, results arrive on the event stream."""
+    if not STREAM_SETTINGS['enabled']:
+        return streaming_unavailable()
+    
+    try:
+        img = frame_from_request(request, emotion_system.decode_flags)
+        if img is None:
+            return jsonify({'error': 'No image data provided'}), 400
+        
+        session = stream_manager.get(session_id, client_id=stream_client_id())
+        session.push_frame(img)
+        
+        return jsonify({
+            'accepted': True,
+            'frames_received': session.frames_received,
+            'frames_dropped': session.frames_dropped
+        }), 202
+        
+    except (FrameDecodeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except StreamLimitReached as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Stream frame error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stream/<session_id>/events')
+def stream_events(session_id):
+    """Server-Sent Events stream of smoothed emotion changes for a session."""
+    if not STREAM_SETTINGS['enabled']:
+        return streaming_unavailable()
+    
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    try:
+        session = stream_manager.get(session_id, client_id=stream_client_id())
+        events = stream_manager.listen(session, last_event_id, STREAM_SETTINGS['heartbeat_seconds'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except StreamLimitReached as e:
+        response = jsonify({'error': str(e), 'retry_after': STREAM_SETTINGS['heartbeat_seconds']})
+        response.headers['Retry-After'] = str(int(STREAM_SETTINGS['heartbeat_seconds']))
+        return response, 503
+    
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/stream/<session_id>', methods=['GET', 'DELETE'])
+def stream_session(session_id):
+    """Get a session's counters, or close it with DELETE."""
+    if not STREAM_SETTINGS['enabled']:
+        return streaming_unavailable()
+    
+    if request.method == 'DELETE':
+        return jsonify({'success': stream_manager.close(session_id)})
+    
+    try:
+        session = stream_manager.get(session_id, create=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    
+    return jsonify(session.stats())
+
 @app.route('/auto-capture', methods=['POST'])
 def toggle_auto_capture():
     """Toggle automatic emotion capture."""
@@ -346,14 +944,23 @@ def toggle_auto_capture():
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     """Get or update system settings."""
+    try:
+        session = request_session()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     if request.method == 'GET':
         return jsonify({
             'songs_before_recheck': emotion_system.songs_before_recheck,
-            'current_emotion': emotion_system.current_emotion,
-            'songs_played': emotion_system.songs_played,
+            'current_emotion': session.current_emotion,
+            'songs_played': session.songs_played,
+            'songs_since_check': session.songs_since_check,
+            'inference_calls_skipped': session.skipped_calls,
             'auto_capture_enabled': emotion_system.auto_capture_enabled,
             'auto_capture_interval': AUTO_CAPTURE_SETTINGS['interval_seconds'],
-            'auto_play_random_song': AUTO_CAPTURE_SETTINGS['auto_play_random_song']
+            'auto_play_random_song': AUTO_CAPTURE_SETTINGS['auto_play_random_song'],
+            'streaming_enabled': STREAM_SETTINGS['enabled'],
+            'streaming_message': None if STREAM_SETTINGS['enabled'] else STREAMING_UNAVAILABLE
         })
     
     elif request.method == 'POST':
@@ -367,33 +974,68 @@ def settings():
         
         return jsonify({'success': True})
 
+@app.route('/cache-stats', methods=['GET', 'DELETE'])
+def cache_stats():
+    """Get result-cache hit/miss counters, or clear the cache with DELETE."""
+    if request.method == 'DELETE':
+        emotion_system.result_cache.clear()
+    
+    return jsonify(emotion_system.result_cache.stats())
+
 @app.route('/reset', methods=['POST'])
 def reset_counter():
     """Reset the song counter."""
-    emotion_system.songs_played = 0
+    try:
+        session = request_session()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with session.lock:
+        session.reset()
+    emotion_system.sessions.save(session)
     return jsonify({'success': True, 'songs_played': 0})
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text-format metrics: per-stage latency histograms, queue depth, detector, model and cache state."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; returns 503 until the emotion model is warm."""
+    ready = emotion_system.is_ready()
+    
     return jsonify({
-        'status': 'healthy', 
+        'status': 'healthy' if ready else 'starting',
+        'ready': ready,
+        'model_state': emotion_system.model_state,
+        'model_load_seconds': emotion_system.model_load_seconds,
+        'model_error': emotion_system.model_error,
+        'worker_pid': os.getpid(),
         'timestamp': datetime.now().isoformat(),
-        'emotion_detector': 'DeepFace',
+        'emotion_detector': emotion_system.detector_type,
+        'inference_mode': emotion_system.executor.mode,
         'version': '3.0-deepface',
         'auto_capture': emotion_system.is_running,
-        'spotify_connected': emotion_system.spotify_client is not None
-    })
+        'capture': emotion_system.frame_grabber.stats(),
+        'spotify_connected': emotion_system.spotify_client is not None,
+        'track_catalog': emotion_system.track_catalog.stats() if emotion_system.track_catalog else None,
+        'recommender': emotion_system.recommender.stats() if emotion_system.recommender else None,
+        'inference': emotion_system.executor.stats(),
+        'admission': emotion_system.admission.stats(),
+        'frame_quality': emotion_system.quality_gate.stats(),
+        'sessions': emotion_system.sessions.stats()
+    }), 200 if ready else 503
 
 @app.route('/test')
 def test_emotion():
     """Test endpoint."""
     return jsonify({
-        'message': 'DeepFace emotion detection system ready',
-        'detector': 'DeepFace + Spotify',
+        'message': f'{emotion_system.detector_type} emotion detection system ready',
+        'detector': f'{emotion_system.detector_type} + Spotify',
         'supported_emotions': list(EMOTION_PLAYLISTS.keys()),
         'features': [
-            'Real emotion detection with DeepFace',
+            f'Real emotion detection with {emotion_system.detector_type}',
             'Automatic webcam capture',
             'Random song selection from playlists',
             'Spotify integration'
@@ -402,10 +1044,10 @@ def test_emotion():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    print("🎵 Emotion Music Recommender - DeepFace Edition")
+    print("🎵 Emotion Music Recommender")
     print("=" * 60)
     print(f"🌐 Server starting on: http://localhost:{port}")
-    print("🧠 Emotion Detection: DeepFace (Real AI)")
+    print(f"🧠 Emotion Detection: {emotion_system.detector_type}")
     print("📷 Auto-capture: Every 30 seconds")
     print("🎵 Music: Random songs from Spotify playlists")
     print("🔄 Auto-play: Enabled")
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the analyze pipeline
+Run from the repository root:
+
+    python -m bench.micro --output bench_micro.json
+    python -m bench.load --mode closed --concurrency 8 --duration 20
+    python -m bench.load --mode sweep --start-rps 5 --step-rps 5 --slo-p99-ms 500
+
+Every run prints one JSON document (commit, environment, results) so runs can be
+diffed between commits.
+"""
@@ -0,0 +1,71 @@
+"""
+Synthetic face-like frames
+Deterministic (seeded) frames with a skin-toned face, eyes, brows and a mouth on a
+noisy background, encoded at several resolutions and JPEG qualities.
+"""
+import base64
+import cv2
+import numpy as np
+
+RESOLUTIONS = {
+    'qvga': (240, 320),
+    'vga': (480, 640),
+    'hd': (720, 1280)
+}
+JPEG_QUALITIES = (50, 80, 95)
+
+def make_face_frame(height=480, width=640, seed=0, smile=True):
+    """One BGR frame with a face roughly where a webcam user would be."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+
+    # Soft gradient background so JPEG has something to compress
+    gradient = np.linspace(0, 60, width, dtype=np.float32)
+    frame = np.clip(frame + gradient[None, :, None], 0, 255).astype(np.uint8)
+
+    cx = width // 2 + int(rng.integers(-width // 20, width // 20 + 1))
+    cy = height // 2
+    face_w, face_h = width // 6, int(height // 3.2)
+
+    cv2.ellipse(frame, (cx, cy), (face_w, face_h), 0, 0, 360, (140, 170, 215), -1)
+    eye_y = cy - face_h // 4
+    for dx in (-face_w // 2, face_w // 2):
+        cv2.ellipse(frame, (cx + dx, eye_y), (face_w // 5, face_h // 12), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(frame, (cx + dx, eye_y), max(2, face_h // 16), (40, 30, 30), -1)
+        cv2.line(frame, (cx + dx - face_w // 4, eye_y - face_h // 6), (cx + dx + face_w // 4, eye_y - face_h // 6),
+                 (50, 50, 70), max(2, face_h // 30))
+
+    cv2.line(frame, (cx, eye_y + face_h // 8), (cx, cy + face_h // 8), (110, 140, 190), max(2, face_h // 40))
+    mouth_angle = (0, 180) if smile else (180, 360)
+    cv2.ellipse(frame, (cx, cy + face_h // 3), (face_w // 2, face_h // 8), 0, mouth_angle[0], mouth_angle[1],
+                (60, 60, 150), max(2, face_h // 30))
+
+    return frame
+
+def encode_jpeg(frame, quality=80):
+    """JPEG bytes of a frame."""
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buffer.tobytes()
+
+def to_data_url(jpeg_bytes):
+    """data:image/jpeg;base64,... string as the browser sends it."""
+    return 'data:image/jpeg;base64,' + base64.b64encode(jpeg_bytes).decode('ascii')
+
+def frame_set(resolutions=None, qualities=JPEG_QUALITIES, variants=4):
+    """
+    {(resolution, quality): [{'frame', 'jpeg', 'data_url'}, ...]} with `variants` slightly different frames each,
+    so perceptual caches are not hit by accident.
+    """
+    frames = {}
+    for name in resolutions or RESOLUTIONS:
+        height, width = RESOLUTIONS[name]
+        for quality in qualities:
+            items = []
+            for seed in range(variants):
+                frame = make_face_frame(height, width, seed=seed, smile=seed % 2 == 0)
+                jpeg = encode_jpeg(frame, quality)
+                items.append({'frame': frame, 'jpeg': jpeg, 'data_url': to_data_url(jpeg)})
+            frames[(name, quality)] = items
+    return frames
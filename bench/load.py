@@ -0,0 +1,258 @@
+"""
+HTTP load generator for /analyze
+
+    python -m bench.load --mode closed --concurrency 8 --duration 20
+    python -m bench.load --mode open --rps 20 --duration 20
+    python -m bench.load --mode sweep --start-rps 5 --step-rps 5 --slo-p99-ms 500 --url http://localhost:8080
+    python -m bench.load --no-result-cache --no-session-reuse   # Every request reaches the model
+
+closed: N clients each send the next request as soon as the previous one returns.
+open:   requests are issued on a fixed schedule regardless of how fast the server answers;
+        latency is measured from the scheduled send time, so queueing is not hidden.
+sweep:  open-loop runs at increasing rates; the highest rate that keeps p99 under the SLO,
+        errors under --max-error-rate and actually achieves the offered rate is reported
+        as max_sustainable_rps.
+
+Each session steps through the frame variants, so repeated frames only hit the result cache
+and the per-session scene reuse when those are on. --no-session-reuse sends every request
+under a fresh session ID; --no-result-cache disables the in-process server's cache (a server
+given with --url must be started with RESULT_CACHE_ENABLED=false). The report records both.
+
+Without --url the Flask app is started in-process on a free port.
+"""
+import argparse
+import contextlib
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.frames import RESOLUTIONS, frame_set
+from bench.report import environment, summarize, write_report
+
+class LoadTarget:
+    """Sends /analyze requests with pre-encoded synthetic frames"""
+
+    def __init__(self, base_url, payload='jpeg', resolution='vga', quality=80, variants=8, sessions=16, timeout=30.0,
+                 session_reuse=True):
+        self.url = base_url.rstrip('/') + '/analyze'
+        self.payload = payload
+        self.timeout = timeout
+        self.sessions = [f'bench-{i}' for i in range(sessions)]
+        self.session_reuse = session_reuse
+        self._run_id = uuid.uuid4().hex[:8]  # Keeps fresh session IDs unique across runs
+
+        items = frame_set([resolution], [quality], variants=variants)[(resolution, quality)]
+        self.bodies = [item['jpeg'] for item in items] if payload == 'jpeg' else [item['data_url'] for item in items]
+        self._counter = itertools.count()
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self):
+        """One request; returns the HTTP status (or 'error' when the connection failed)."""
+        n = next(self._counter)
+        # Sessions take turns, and each one moves to the next frame variant on its next turn
+        body = self.bodies[(n // len(self.sessions)) % len(self.bodies)]
+        if self.session_reuse:
+            session_id = self.sessions[n % len(self.sessions)]
+        else:
+            session_id = f'bench-{self._run_id}-{n}'
+        headers = {'X-Session-ID': session_id}
+
+        try:
+            if self.payload == 'jpeg':
+                headers['Content-Type'] = 'image/jpeg'
+                response = self._session().post(self.url, data=body, headers=headers, timeout=self.timeout)
+            else:
+                response = self._session().post(self.url, json={'image': body}, headers=headers, timeout=self.timeout)
+            return response.status_code
+        except requests.RequestException:
+            return 'error'
+
+def _result(latencies, statuses, elapsed, offered_rps=None):
+    ok = [latency for latency, status in zip(latencies, statuses) if status == 200]
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+    result = {
+        'requests': len(statuses),
+        'duration_seconds': round(elapsed, 3),
+        'achieved_rps': round(len(statuses) / elapsed, 2) if elapsed else 0.0,
+        'success_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'error_rate': round(1.0 - len(ok) / len(statuses), 4) if statuses else 0.0,
+        'status_counts': counts,
+        'latency': summarize(ok)
+    }
+    if offered_rps is not None:
+        result['offered_rps'] = offered_rps
+    return result
+
+def closed_loop(target, concurrency, duration):
+    """concurrency clients back to back for duration seconds."""
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = target.send()
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                statuses.append(status)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = _result(latencies, statuses, time.perf_counter() - start)
+    result['concurrency'] = concurrency
+    return result
+
+def open_loop(target, rps, duration, max_workers=64, poisson=False, seed=0):
+    """Issue requests at a fixed (or Poisson) rate; latency counts from the scheduled send time."""
+    rng = random.Random(seed)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def fire(scheduled):
+        status = target.send()
+        latency = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(latency)
+            statuses.append(status)
+
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while scheduled < start + duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, scheduled)
+            scheduled += rng.expovariate(rps) if poisson else 1.0 / rps
+
+    return _result(latencies, statuses, time.perf_counter() - start, offered_rps=rps)
+
+def sweep(target, start_rps, step_rps, max_rps, duration, slo_p99_ms, max_error_rate, max_workers, poisson):
+    """Raise the offered rate until the SLO breaks; report the last rate that held."""
+    steps = []
+    sustainable = None
+    rps = start_rps
+
+    while rps <= max_rps:
+        result = open_loop(target, rps, duration, max_workers, poisson)
+        p99 = result['latency'].get('p99_ms')
+        passed = (
+            p99 is not None and p99 <= slo_p99_ms
+            and result['error_rate'] <= max_error_rate
+            and result['achieved_rps'] >= 0.95 * rps
+        )
+        result['passed'] = passed
+        steps.append(result)
+        print(f"sweep {rps} rps: p99={p99}ms errors={result['error_rate']} passed={passed}", file=sys.stderr)
+
+        if not passed:
+            break
+        sustainable = rps
+        rps += step_rps
+
+    return {'max_sustainable_rps': sustainable, 'slo_p99_ms': slo_p99_ms, 'steps': steps}
+
+def start_local_server(result_cache=True):
+    """Run the Flask app in-process on a free port; returns its base URL."""
+    from werkzeug.serving import make_server
+    if not result_cache:
+        os.environ['RESULT_CACHE_ENABLED'] = 'false'
+    with contextlib.redirect_stdout(sys.stderr):  # Keep the app's startup banner out of the JSON report
+        import app
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+def result_cache_enabled(base_url):
+    """Whether the server's result cache is on, from /cache-stats (None if it can't be read)."""
+    try:
+        return requests.get(base_url.rstrip('/') + '/cache-stats', timeout=5.0).json()['enabled']
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the /analyze endpoint')
+    parser.add_argument('--url', help='Base URL of a running server (default: start the app in-process)')
+    parser.add_argument('--mode', choices=['closed', 'open', 'sweep'], default='closed')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run (per step for sweep)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Clients in closed-loop mode')
+    parser.add_argument('--rps', type=float, default=10.0, help='Offered rate in open-loop mode')
+    parser.add_argument('--start-rps', type=float, default=5.0)
+    parser.add_argument('--step-rps', type=float, default=5.0)
+    parser.add_argument('--max-rps', type=float, default=500.0)
+    parser.add_argument('--slo-p99-ms', type=float, default=500.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--max-workers', type=int, default=64, help='Open-loop sender threads')
+    parser.add_argument('--poisson', action='store_true', help='Poisson arrivals instead of a fixed interval')
+    parser.add_argument('--payload', choices=['jpeg', 'json'], default='jpeg')
+    parser.add_argument('--resolution', choices=list(RESOLUTIONS), default='vga')
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--variants', type=int, default=8, help='Distinct frames cycled through')
+    parser.add_argument('--sessions', type=int, default=16, help='Distinct X-Session-ID values')
+    parser.add_argument('--no-result-cache', action='store_true',
+                        help='Disable the result cache of the in-process server')
+    parser.add_argument('--no-session-reuse', action='store_true',
+                        help='Fresh X-Session-ID per request, so unchanged scenes are never answered from the session')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base_url = args.url or start_local_server(result_cache=not args.no_result_cache)
+    result_cache = result_cache_enabled(base_url)
+    if args.no_result_cache and result_cache:
+        parser.error('the server at --url has its result cache on; start it with RESULT_CACHE_ENABLED=false')
+    target = LoadTarget(base_url, args.payload, args.resolution, args.quality, args.variants, args.sessions,
+                        session_reuse=not args.no_session_reuse)
+
+    if args.mode == 'closed':
+        results = closed_loop(target, args.concurrency, args.duration)
+    elif args.mode == 'open':
+        results = open_loop(target, args.rps, args.duration, args.max_workers, args.poisson)
+    else:
+        results = sweep(target, args.start_rps, args.step_rps, args.max_rps, args.duration,
+                        args.slo_p99_ms, args.max_error_rate, args.max_workers, args.poisson)
+
+    write_report({
+        'benchmark': f'load-{args.mode}',
+        'environment': environment(),
+        'config': {
+            'target': base_url if args.url else 'in-process',
+            'payload': args.payload,
+            'resolution': args.resolution,
+            'quality': args.quality,
+            'variants': args.variants,
+            'sessions': args.sessions,
+            'result_cache': result_cache,
+            'session_reuse': not args.no_session_reuse,
+            'duration_seconds': args.duration
+        },
+        'results': results
+    }, args.output)
+
+if __name__ == '__main__':
+    main()
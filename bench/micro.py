@@ -0,0 +1,192 @@
+"""
+Microbenchmarks for the analyze pipeline
+
+    python -m bench.micro [--iterations 200] [--resolutions qvga vga] [--output bench_micro.json]
+
+Benchmarks:
+- FallbackEmotionDetector.analyze_emotion_from_base64
+- DeepFaceEmotionSystem.analyze_emotion_from_base64 (real model if TensorFlow/DeepFace is
+  installed, otherwise DeepFace is replaced by a stub model with --stub-latency-ms per batch)
+- convert_to_json_serializable on a realistic result
+- get_playlist_for_emotion
+
+Check (exit status 1 when it fails):
+- detector.analyze_frames over N frames (the /analyze-batch path) runs as one batch of N
+"""
+import argparse
+import contextlib
+import itertools
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from bench.frames import JPEG_QUALITIES, RESOLUTIONS, frame_set
+from bench.report import environment, summarize, write_report
+
+EMOTIONS = ['happy', 'sad', 'angry', 'neutral', 'fear', 'surprise', 'disgust']
+
+class StubEmotionModel:
+    """Stands in for the DeepFace emotion model: same input/output shapes, fixed cost per batch"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_seconds = latency_ms / 1000.0
+
+    def predict(self, faces, verbose=0):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        # Brightness of each crop tilts the scores, so different frames give different answers
+        brightness = faces.reshape(len(faces), -1).mean(axis=1, keepdims=True)
+        scores = np.tile(np.linspace(1.0, 2.0, 7, dtype=np.float32), (len(faces), 1))
+        scores[:, 3:4] += brightness * 4.0
+        return scores / scores.sum(axis=1, keepdims=True)
+
+class StubDeepFace:
+    latency_ms = 0.0
+
+    @classmethod
+    def build_model(cls, name):
+        return StubEmotionModel(cls.latency_ms)
+
+def measure(fn, inputs, iterations, warmup):
+    """Call fn over the inputs (cycled) and time each call."""
+    cycle = itertools.cycle(inputs)
+    for _ in range(warmup):
+        fn(next(cycle))
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        item = next(cycle)
+        call_start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies)
+    summary['ops_per_sec'] = round(iterations / elapsed, 1) if elapsed else None
+    return summary
+
+def load_system(stub_latency_ms):
+    """Import the app's emotion system, swapping in a stubbed DeepFace detector when TensorFlow is absent."""
+    # Benchmarks measure the call itself: inline inference, and the model runs even if no face is found
+    os.environ.setdefault('INFERENCE_MODE', 'inline')
+    os.environ.setdefault('SKIP_ON_NO_FACE', 'false')
+    with contextlib.redirect_stdout(sys.stderr):  # Keep the app's startup banner out of the JSON report
+        import app
+    import emotion_deepface
+
+    system = app.emotion_system
+    detector_label = system.detector_type
+    if system.detector_name != 'deepface':
+        StubDeepFace.latency_ms = stub_latency_ms
+        emotion_deepface.DeepFace = StubDeepFace
+        system.detector = emotion_deepface.DeepFaceEmotionDetector()
+        system.executor.detector = system.detector
+        # The app picked its decode from the detector it built (reduced grayscale for the fallback)
+        system.decode_flags = getattr(system.detector, 'decode_flags', cv2.IMREAD_COLOR)
+        detector_label = f'DeepFace (stub model, {stub_latency_ms}ms/batch)'
+
+    warmup = getattr(system.detector, 'warmup', None)
+    if warmup is not None:
+        warmup()
+    return app, system, detector_label
+
+def check_batching(detector, frames):
+    """Forward passes for one analyze_frames call; frames up to max_batch_size must share one batch."""
+    batcher = detector.batcher
+    before = batcher.stats()
+    detector.analyze_frames(frames)
+    after = batcher.stats()
+
+    batches = after['batches_run'] - before['batches_run']
+    items = after['items_processed'] - before['items_processed']
+    expected = -(-len(frames) // batcher.max_batch_size)
+    return {
+        'frames': len(frames),
+        'batches': batches,
+        'batch_size': round(items / batches, 2) if batches else 0.0,
+        'passed': items == len(frames) and batches == expected
+    }
+
+def run(args):
+    from emotion_fallback import FallbackEmotionDetector
+
+    frames = frame_set(args.resolutions, args.qualities, variants=args.variants)
+    app, system, detector_label = load_system(args.stub_latency_ms)
+    system.result_cache.enabled = args.result_cache
+
+    results = {}
+
+    fallback = FallbackEmotionDetector()
+    for (resolution, quality), items in frames.items():
+        data_urls = [item['data_url'] for item in items]
+        key = f'{resolution}_q{quality}'
+        results.setdefault('fallback.analyze_emotion_from_base64', {})[key] = dict(
+            measure(fallback.analyze_emotion_from_base64, data_urls, args.iterations, args.warmup),
+            payload_bytes=int(np.mean([len(u) for u in data_urls]))
+        )
+        results.setdefault('system.analyze_emotion_from_base64', {})[key] = dict(
+            measure(system.analyze_emotion_from_base64, data_urls, args.iterations, args.warmup),
+            payload_bytes=int(np.mean([len(u) for u in data_urls]))
+        )
+
+    batch_frames = [item['frame'] for items in frames.values() for item in items][:args.batch_frames]
+    results['detector.analyze_frames.batching'] = check_batching(system.detector, batch_frames)
+
+    sample = system.detector.analyze_emotion_from_frame(next(iter(frames.values()))[0]['frame'])
+    sample = dict(sample, emotion_scores={k: np.float32(v) for k, v in sample.get('emotion_scores', {}).items()},
+                  face_box=np.array([10, 20, 100, 100]) if sample.get('face_box') else None)
+    results['convert_to_json_serializable'] = measure(
+        app.convert_to_json_serializable, [sample], args.iterations * 10, args.warmup
+    )
+
+    session = system.get_session('bench')
+    results['get_playlist_for_emotion'] = measure(
+        lambda emotion: system.get_playlist_for_emotion(emotion, session),
+        EMOTIONS, args.iterations * 10, args.warmup
+    )
+
+    return {
+        'benchmark': 'micro',
+        'environment': environment(),
+        'config': {
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'variants': args.variants,
+            'system_detector': detector_label,
+            'inference_mode': system.executor.mode,
+            'result_cache': args.result_cache
+        },
+        'results': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for the emotion analysis pipeline')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--variants', type=int, default=4, help='Distinct frames per resolution/quality')
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=['qvga', 'vga'])
+    parser.add_argument('--qualities', nargs='+', type=int, default=list(JPEG_QUALITIES))
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0,
+                        help='Simulated model cost per batch when DeepFace is stubbed')
+    parser.add_argument('--result-cache', action='store_true', help='Keep the perceptual result cache on')
+    parser.add_argument('--batch-frames', type=int, default=5, help='Frames in the analyze_frames batching check')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    report = run(args)
+    write_report(report, args.output)
+
+    batching = report['results']['detector.analyze_frames.batching']
+    if not batching['passed']:
+        print(f"batching check failed: {batching['frames']} frames ran as {batching['batches']} batches",
+              file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Shared helpers for benchmark reports: latency summaries and run metadata
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+def percentile(sorted_values, q):
+    """q-th percentile (0-100) of an already sorted list, linear interpolation."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(latencies_seconds):
+    """Latency summary in milliseconds."""
+    values = sorted(latencies_seconds)
+    if not values:
+        return {'count': 0}
+
+    to_ms = lambda seconds: round(seconds * 1000.0, 3)
+    return {
+        'count': len(values),
+        'mean_ms': to_ms(sum(values) / len(values)),
+        'min_ms': to_ms(values[0]),
+        'p50_ms': to_ms(percentile(values, 50)),
+        'p95_ms': to_ms(percentile(values, 95)),
+        'p99_ms': to_ms(percentile(values, 99)),
+        'max_ms': to_ms(values[-1])
+    }
+
+def git_commit():
+    """Short hash of HEAD (with -dirty when the tree has changes), or None outside a git checkout."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--'], cwd=root, stderr=subprocess.DEVNULL)
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    """What the numbers were measured on."""
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def write_report(report, output=None):
+    """Print the report as JSON and optionally save it."""
+    text = json.dumps(report, indent=2, sort_keys=False)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
@@ -0,0 +1,66 @@
+"""
+Cold-start benchmark: app import time, peak RSS and which heavy frameworks got imported
+
+    python -m bench.startup [--backends fallback onnx auto] [--repeat 3] [--warmup]
+
+Each measurement runs in a fresh interpreter, so nothing is shared between runs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from bench.report import environment, summarize, write_report
+
+PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'import_seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'detector': app.emotion_system.detector_type,
+    'model_state': app.emotion_system.model_state,
+    'tensorflow_imported': 'tensorflow' in sys.modules,
+    'deepface_imported': 'deepface' in sys.modules
+}))
+'''
+
+def measure(backend, warmup):
+    """Import the app once in a child process."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, EMOTION_DETECTOR=backend, WARMUP_ON_STARTUP='true' if warmup else 'false')
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=root, env=env,
+                                     stderr=subprocess.DEVNULL, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app cold-start time and memory per detector backend')
+    parser.add_argument('--backends', nargs='+', default=['fallback', 'onnx', 'auto'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', action='store_true', help='Load the model during import (WARMUP_ON_STARTUP)')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backends:
+        runs = [measure(backend, args.warmup) for _ in range(args.repeat)]
+        results[backend] = {
+            'detector': runs[-1]['detector'],
+            'import': summarize([run['import_seconds'] for run in runs]),
+            'max_rss_mb': round(max(run['max_rss_mb'] for run in runs), 1),
+            'tensorflow_imported': any(run['tensorflow_imported'] for run in runs),
+            'deepface_imported': any(run['deepface_imported'] for run in runs)
+        }
+
+    write_report({
+        'benchmark': 'startup',
+        'environment': environment(),
+        'config': {'repeat': args.repeat, 'warmup': args.warmup},
+        'results': results
+    }, args.output)
+
+if __name__ == '__main__':
+    main()
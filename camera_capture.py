@@ -0,0 +1,187 @@
+"""
+Persistent frame capture for auto-capture
+One long-lived cv2.VideoCapture is read by a producer thread into a small ring buffer;
+consumers take the newest frame as a raw ndarray. The device is opened once instead of
+per sample, and frames skip the JPEG/base64 round trip. Any VideoCapture source works:
+a camera index, a video file (looped, paced to its frame rate) or a stream URL.
+"""
+import cv2
+import logging
+import threading
+import time
+from collections import deque
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+def parse_source(source):
+    """'0' -> camera index 0; anything else is passed to VideoCapture as a path or URL."""
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+class FrameGrabber:
+    """Producer thread keeping the latest frames of a capture source in a ring buffer"""
+
+    def __init__(self, source=0, buffer_size=4, max_fps=None, reopen_seconds=2.0, loop_files=True):
+        self.source = parse_source(source)
+        # Cameras and network streams are read as fast as they deliver; files are paced and looped
+        self.is_live = isinstance(self.source, int) or '://' in self.source
+        self.max_fps = float(max_fps) if max_fps else None
+        self.reopen_seconds = float(reopen_seconds)
+        self.loop_files = loop_files
+
+        self.frames_captured = 0
+        self.frames_dropped = 0  # Overwritten before any consumer took them
+        self.opens = 0
+        self.last_error = None
+
+        self._frames = deque(maxlen=max(1, int(buffer_size)))
+        self._sequence = 0
+        self._consumed = 0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Open the source and start the producer thread (no-op if already running)."""
+        with self._condition:
+            if self._running and self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._produce, name='frame-grabber', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the producer and release the device."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._frames.clear()
+
+    @property
+    def running(self):
+        return self._running
+
+    def latest(self, timeout=5.0, max_age_seconds=None):
+        """
+        Newest frame as an ndarray, waiting up to timeout for one to arrive.
+        Frames older than max_age_seconds are not returned. Returns None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with stage_timer('capture_wait'), self._condition:
+            while self._running:
+                if self._frames:
+                    sequence, captured_at, frame = self._frames[-1]
+                    if max_age_seconds is None or time.monotonic() - captured_at <= max_age_seconds:
+                        self._consumed = sequence
+                        return frame
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+        return None
+
+    def recent(self, count=None):
+        """Up to count newest buffered frames, oldest first."""
+        with self._condition:
+            frames = [frame for _, _, frame in self._frames]
+        return frames[-count:] if count else frames
+
+    def stats(self):
+        """Return capture counters."""
+        return {
+            'source': str(self.source),
+            'running': self._running,
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'buffered': len(self._frames),
+            'opens': self.opens,
+            'last_error': self.last_error
+        }
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            capture.release()
+            self.last_error = f'Could not open capture source {self.source}'
+            logger.error(self.last_error)
+            return None
+
+        self.opens += 1
+        if isinstance(self.source, int):
+            # Keep the driver queue short so the newest frame is never several frames behind
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        logger.info(f"Capture source {self.source} opened")
+        return capture
+
+    def _frame_interval(self, capture):
+        """Seconds between retained frames: max_fps, or a file's own frame rate."""
+        if self.max_fps:
+            return 1.0 / self.max_fps
+        if not self.is_live:
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            return 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        return 0.0  # Live sources block in read() at their own rate
+
+    def _produce(self):
+        capture = None
+        interval = 0.0
+        next_frame = time.monotonic()
+        rewound = False
+
+        try:
+            while self._running:
+                if capture is None:
+                    capture = self._open()
+                    if capture is None:
+                        self._sleep(self.reopen_seconds)
+                        continue
+                    interval = self._frame_interval(capture)
+                    next_frame = time.monotonic()
+
+                now = time.monotonic()
+                if now < next_frame:
+                    if self.is_live:
+                        capture.grab()  # Drain the source without decoding frames we would drop
+                    else:
+                        self._sleep(next_frame - now)
+                    continue
+
+                ok, frame = capture.read()
+                if not ok:
+                    if not self.is_live and self.loop_files and not rewound:
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)  # End of file: rewind
+                        rewound = True
+                        continue
+                    self.last_error = f'Read from capture source {self.source} failed'
+                    logger.warning(f"{self.last_error}; reopening in {self.reopen_seconds}s")
+                    capture.release()
+                    capture = None
+                    self._sleep(self.reopen_seconds)
+                    continue
+
+                rewound = False
+                next_frame = max(next_frame + interval, time.monotonic()) if interval else 0.0
+                self._publish(frame)
+        finally:
+            if capture is not None:
+                capture.release()
+            logger.info(f"Capture source {self.source} released")
+
+    def _publish(self, frame):
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen and self._frames[0][0] > self._consumed:
+                self.frames_dropped += 1
+            self._sequence += 1
+            self._frames.append((self._sequence, time.monotonic(), frame))
+            self.frames_captured += 1
+            self._condition.notify_all()
+
+    def _sleep(self, seconds):
+        with self._condition:
+            if self._running:
+                self._condition.wait(seconds)
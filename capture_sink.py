@@ -0,0 +1,121 @@
+"""
+Asynchronous debug-capture sink
+Keeps disk writes off the request path: frames are sampled into a bounded queue
+and written by a background thread under unique names with a retention cap
+"""
+import cv2
+import glob
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+class DebugCaptureSink:
+    """Samples analyzed frames to disk for debugging without blocking requests"""
+
+    FILE_PREFIX = 'capture_'
+
+    def __init__(self, directory, enabled=False, sample_rate=0.05, max_queue=8, max_files=200, jpeg_quality=85):
+        self.directory = directory
+        self.enabled = enabled
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.max_files = max(1, int(max_files))
+        self.jpeg_quality = int(jpeg_quality)
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._files = deque()
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def offer(self, img):
+        """Queue a frame for writing if it is sampled; never blocks. Returns True if queued."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+
+        self._ensure_worker()
+        try:
+            # The frame is not copied: callers treat decoded frames as read-only
+            self._queue.put_nowait(img)
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def stats(self):
+        """Return sink counters."""
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'files_retained': len(self._files),
+            'queue_depth': self._queue.qsize()
+        }
+
+    def _ensure_worker(self):
+        """Start the writer thread lazily (and again in a forked child process)."""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_existing_files()
+
+            self._worker_pid = pid
+            self._worker = threading.Thread(target=self._writer_loop, name='debug-capture-writer', daemon=True)
+            self._worker.start()
+
+    def _load_existing_files(self):
+        """Pick up captures left by earlier runs so the retention cap covers them too."""
+        pattern = os.path.join(self.directory, f'{self.FILE_PREFIX}*.jpg')
+        self._files = deque(sorted(glob.glob(pattern), key=os.path.getmtime))
+        self._enforce_retention()
+
+    def _next_path(self):
+        """Unique file name per frame, so concurrent requests and workers never clobber each other."""
+        self._sequence += 1
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = f'{self.FILE_PREFIX}{stamp}_{os.getpid()}_{self._sequence:06d}.jpg'
+        return os.path.join(self.directory, name)
+
+    def _enforce_retention(self):
+        """Delete the oldest captures beyond max_files."""
+        while len(self._files) > self.max_files:
+            old_path = self._files.popleft()
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def _writer_loop(self):
+        """Write queued frames forever."""
+        while True:
+            img = self._queue.get()
+            path = self._next_path()
+
+            try:
+                with stage_timer('disk_write'):
+                    written = cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if written:
+                    self._files.append(path)
+                    self.frames_written += 1
+                    self._enforce_retention()
+                else:
+                    logger.error(f"Debug capture could not write {path}")
+            except Exception as e:
+                logger.error(f"Debug capture write failed: {e}")
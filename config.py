@@ -6,7 +6,9 @@ SPOTIFY_CONFIG = {
     'username': os.getenv('SPOTIFY_USERNAME', 'aadish'),
     'client_id': os.getenv('SPOTIFY_CLIENT_ID', '63b8d384874843a7a8fbdd09ca6aea5f'),
     'client_secret': os.getenv('SPOTIFY_CLIENT_SECRET', '672a3ea80d364ac69cf3114252503ed1'),
-    'redirect_uri': os.getenv('SPOTIFY_REDIRECT_URI', 'http://google.com/callback/')
+    'redirect_uri': os.getenv('SPOTIFY_REDIRECT_URI', 'http://google.com/callback/'),
+    'api_base': os.getenv('SPOTIFY_API_BASE', ''),  # e.g. http://localhost:8765/v1 for fake_spotify.py
+    'access_token': os.getenv('SPOTIFY_ACCESS_TOKEN', '')  # Skips the client-credentials flow when set
 }
 
 # Emotion to Playlist Mapping with individual track URLs
@@ -41,6 +43,19 @@ EMOTION_PLAYLISTS = {
     ]
 }
 
+# Detector labels without their own playlists, mapped to the closest emotion that has them
+EMOTION_ALIASES = {
+    'surprise': 'happy',
+    'disgust': 'angry',
+    'contempt': 'angry',
+    'happiness': 'happy',
+    'sadness': 'sad',
+    'anger': 'angry'
+}
+
+# Optional selection weights per playlist URL (default 1.0)
+PLAYLIST_WEIGHTS = {}
+
 # Auto-capture settings
 AUTO_CAPTURE_SETTINGS = {
     'enabled': True,
@@ -49,7 +64,170 @@ AUTO_CAPTURE_SETTINGS = {
     'auto_play_random_song': True  # Automatically play random song from playlist
 }
 
+# Persistent capture for auto-capture - one open device, newest frame always ready
+CAPTURE_SETTINGS = {
+    'source': os.getenv('CAPTURE_SOURCE', '0'),  # Camera index, video file or stream URL
+    'buffer_size': 4,  # Newest frames kept by the producer thread
+    'max_fps': float(os.getenv('CAPTURE_MAX_FPS', '5')),  # Frames decoded per second (0 = every frame)
+    'frame_timeout_seconds': 5.0,  # Wait for a first frame after opening the source
+    'max_frame_age_seconds': 2.0,  # Older frames (e.g. from a stalled camera) are not analyzed
+    'reopen_seconds': 2.0  # Delay before reopening a source that failed
+}
+
+# Batched inference settings - concurrent frames share one emotion-model forward pass
+BATCH_SETTINGS = {
+    'enabled': os.getenv('BATCH_ENABLED', 'true').lower() == 'true',
+    'max_batch_size': int(os.getenv('BATCH_MAX_SIZE', '16')),  # Frames per forward pass
+    'max_wait_ms': float(os.getenv('BATCH_MAX_WAIT_MS', '5')),  # How long to wait for more frames
+    'max_request_images': int(os.getenv('BATCH_MAX_REQUEST_IMAGES', '32'))  # Limit for /analyze-batch
+}
+
+# Inference executor - where emotion analysis runs and how much work may queue up
+INFERENCE_SETTINGS = {
+    'mode': os.getenv('INFERENCE_MODE', 'inline'),  # 'inline', 'thread' or 'process'
+    'workers': int(os.getenv('INFERENCE_WORKERS', str(os.cpu_count() or 2))),  # Pool size for thread/process modes
+    'max_pending': int(os.getenv('INFERENCE_MAX_PENDING', '32')),  # Frames in flight before answering 429
+    'timeout_seconds': float(os.getenv('INFERENCE_TIMEOUT', '30')),  # Per-request wait before answering 503
+    'retry_after_seconds': int(os.getenv('INFERENCE_RETRY_AFTER', '1')),  # Retry-After header value
+    'start_method': os.getenv('INFERENCE_START_METHOD', 'spawn')  # Worker processes never inherit TensorFlow state
+}
+
+# Frame quality gate - unusable frames (dark, overexposed, flat, blurred, moving) never reach the model
+QUALITY_SETTINGS = {
+    'enabled': os.getenv('FRAME_QUALITY_GATE', 'true').lower() == 'true',
+    'width': int(os.getenv('FRAME_QUALITY_WIDTH', '160')),  # Frames are checked as grayscale at about this width
+    'min_brightness': float(os.getenv('FRAME_QUALITY_MIN_BRIGHTNESS', '40')),  # Mean gray level (0-255)
+    'max_brightness': float(os.getenv('FRAME_QUALITY_MAX_BRIGHTNESS', '220')),
+    'min_contrast': float(os.getenv('FRAME_QUALITY_MIN_CONTRAST', '12')),  # Gray-level standard deviation
+    'min_sharpness': float(os.getenv('FRAME_QUALITY_MIN_SHARPNESS', '50')),  # Variance of the Laplacian at FRAME_QUALITY_WIDTH
+    'max_motion': float(os.getenv('FRAME_QUALITY_MAX_MOTION', '40')),  # Mean change from the previous frame; 0 disables
+    'motion_window_seconds': float(os.getenv('FRAME_QUALITY_MOTION_WINDOW', '2'))  # Older previous frames are not compared
+}
+
+# Admission control - degrade /analyze to cheaper tiers (cache, fallback detector, 429) under pressure
+ADMISSION_SETTINGS = {
+    'enabled': os.getenv('ADMISSION_CONTROL', 'true').lower() == 'true',
+    'latency_slo_ms': float(os.getenv('ADMISSION_SLO_MS', '500')),  # Model latency allowed before shedding
+    'percentile': float(os.getenv('ADMISSION_PERCENTILE', '95')),  # Percentile of recent model calls compared to the SLO
+    'window_seconds': float(os.getenv('ADMISSION_WINDOW', '10')),  # How far back model latencies count
+    'max_in_flight': int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '8')),  # Frames on the full model at once
+    'fallback_max_in_flight': int(os.getenv('ADMISSION_FALLBACK_MAX_IN_FLIGHT', '16')),  # 0 disables the fallback tier
+    'cache_max_age_seconds': float(os.getenv('ADMISSION_CACHE_MAX_AGE', '30'))  # Oldest session result served as the cache tier
+}
+
+# Streaming sessions (/stream/<id>/frame + /stream/<id>/events)
+# Sessions live in one process, so a session's frames and its event stream must reach the same worker:
+# 'auto' enables streaming only under a single gunicorn worker (GUNICORN_WORKERS is set by gunicorn.conf.py);
+# 'true' is for deployments that route each session ID to one worker themselves (sticky routing)
+_stream_enabled = os.getenv('STREAM_ENABLED', 'auto').lower()
+_gunicorn_threads = int(os.getenv('GUNICORN_THREADS', '4'))
+STREAM_SETTINGS = {
+    'enabled': _stream_enabled == 'true' or (_stream_enabled == 'auto' and int(os.getenv('GUNICORN_WORKERS', '1')) == 1),
+    # Each open event stream holds a worker thread; the rest stay free for /analyze
+    'max_listeners': int(os.getenv('STREAM_MAX_LISTENERS', str(max(1, _gunicorn_threads // 2)))),
+    'smoothing_alpha': float(os.getenv('STREAM_SMOOTHING_ALPHA', '0.3')),  # Weight of the newest frame in the average
+    'switch_margin': float(os.getenv('STREAM_SWITCH_MARGIN', '5.0')),  # Percentage points a new emotion must lead by
+    'idle_timeout_seconds': float(os.getenv('STREAM_IDLE_TIMEOUT', '60')),  # Sessions without frames or listeners are closed
+    'heartbeat_seconds': 15.0,  # Keep-alive comment interval on the event stream
+    'max_sessions': int(os.getenv('STREAM_MAX_SESSIONS', '100'))
+}
+
+# Per-session emotion state - smoothing and skipping inference on unchanged scenes
+SESSION_SETTINGS = {
+    'default_session_id': 'default',  # Used by auto-capture and clients that send no X-Session-ID
+    'smoothing_alpha': float(os.getenv('SESSION_SMOOTHING_ALPHA', '0.5')),  # Weight of the newest analysis
+    'switch_margin': float(os.getenv('SESSION_SWITCH_MARGIN', '5.0')),  # Percentage points a new emotion must lead by
+    'change_threshold': float(os.getenv('SCENE_CHANGE_THRESHOLD', '8.0')),  # Mean pixel difference (0-255) that counts as a new scene
+    'signature_size': (32, 24),  # Thumbnail used for frame comparisons
+    'shards': int(os.getenv('SESSION_SHARDS', '16')),  # Lock stripes of the session store
+    'idle_timeout_seconds': float(os.getenv('SESSION_IDLE_TIMEOUT', '1800')),  # Forget sessions unused this long
+    'store_url': os.getenv('SESSION_STORE_URL'),  # e.g. redis://localhost:6379/0 to share sessions across workers
+    'store_ttl_seconds': int(os.getenv('SESSION_STORE_TTL', '86400'))
+}
+
+# Model warmup - load weights once at startup instead of inside the first request
+WARMUP_SETTINGS = {
+    'on_startup': os.getenv('WARMUP_ON_STARTUP', 'true').lower() == 'true',
+    # Set by gunicorn.conf.py when preloading: the master loads weights only, workers run the dummy frame
+    'defer_forward_pass': os.getenv('WARMUP_DEFER_FORWARD_PASS', 'false').lower() == 'true',
+    'frame_size': (480, 640)  # Dummy frame (height, width) pushed through the model
+}
+
+# Debug frame capture - sampled and written asynchronously, off by default
+DEBUG_CAPTURE_SETTINGS = {
+    'enabled': os.getenv('DEBUG_CAPTURE', 'false').lower() == 'true',
+    'directory': os.getenv('DEBUG_CAPTURE_DIR', '/tmp/emotion_captures'),
+    'sample_rate': float(os.getenv('DEBUG_CAPTURE_SAMPLE_RATE', '0.05')),  # Fraction of frames saved
+    'max_queue': 8,  # Frames waiting for the writer; extra frames are dropped
+    'max_files': int(os.getenv('DEBUG_CAPTURE_MAX_FILES', '200')),  # Oldest captures are deleted
+    'jpeg_quality': 85
+}
+
+# Face detection ahead of the emotion model (bundled Haar cascade)
+FACE_DETECTION_SETTINGS = {
+    'detection_width': int(os.getenv('FACE_DETECTION_WIDTH', '320')),  # Frames are downscaled to this width for detection
+    'scale_factor': 1.1,
+    'min_neighbors': 5,
+    'min_face_size': 60,  # Minimum face size in full-frame pixels
+    'crop_margin': 0.15,  # Extra border around the detected face
+    'max_faces': int(os.getenv('MAX_FACES', '10')),  # Faces analyzed per frame in multi-face mode
+    'skip_on_no_face': os.getenv('SKIP_ON_NO_FACE', 'true').lower() == 'true'  # Don't run the model without a face
+}
+
+# Result cache - near-identical frames (same perceptual hash) reuse the last analysis
+RESULT_CACHE_SETTINGS = {
+    'enabled': os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true',
+    'ttl_seconds': float(os.getenv('RESULT_CACHE_TTL', '10')),  # How long a cached emotion stays valid
+    'max_entries': int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1024')),  # Least recently used entries are evicted
+    'hash_size': 8  # dHash grid; 8 gives a 64-bit hash
+}
+
+# Emotion detector backend: auto (DeepFace if TensorFlow and DeepFace are installed, else ONNX if its model file exists, else fallback), deepface, onnx or fallback
+DETECTOR_SETTINGS = {
+    'backend': os.getenv('EMOTION_DETECTOR', 'auto')
+}
+
+# ONNX detector - small emotion network on CPU via cv2.dnn or onnxruntime (defaults fit the FER+ model)
+ONNX_SETTINGS = {
+    'model_path': os.getenv('ONNX_EMOTION_MODEL', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'emotion-ferplus-8.onnx')),
+    'runtime': os.getenv('ONNX_RUNTIME', 'auto'),  # auto (onnxruntime if installed), opencv or onnxruntime
+    'precision': os.getenv('ONNX_PRECISION', 'fp32'),  # fp32, fp16 or int8 (see emotion_onnx.py convert)
+    'threads': int(os.getenv('ONNX_THREADS', '0')),  # Inference threads (0 = library default)
+    'input_size': int(os.getenv('ONNX_INPUT_SIZE', '64')),  # Square grayscale face crop
+    'input_scale': float(os.getenv('ONNX_INPUT_SCALE', '255')),  # FER+ expects raw 0-255 pixels; use 1 for 0-1 inputs
+    'softmax': os.getenv('ONNX_SOFTMAX', 'true').lower() == 'true',  # The network outputs logits
+    'labels': os.getenv('ONNX_EMOTION_LABELS', 'neutral,happiness,surprise,sadness,anger,disgust,fear,contempt').split(',')
+}
+
+# Fallback detector (used when TensorFlow/DeepFace is not installed)
+FALLBACK_SETTINGS = {
+    'seed': int(os.environ['FALLBACK_SEED']) if os.getenv('FALLBACK_SEED') else None,  # Fixed seed for reproducible results
+    'decode_reduction': int(os.getenv('FALLBACK_DECODE_REDUCTION', '4')),  # 1, 2, 4 or 8: JPEG decoded straight to gray at 1/n size
+    'stats_width': 160  # Decoded frames are sampled down to about this width for statistics
+}
+
+# Spotify track catalog (individual tracks instead of whole playlists)
+TRACK_CATALOG_SETTINGS = {
+    'enabled': os.getenv('SPOTIFY_CATALOG', 'false').lower() == 'true',
+    'cache_path': os.getenv('TRACK_CACHE_PATH', '/tmp/emotion_music/tracks.sqlite3'),
+    'ttl_seconds': float(os.getenv('TRACK_CACHE_TTL', '86400')),  # Playlists older than this are re-fetched
+    'refresh_interval_seconds': float(os.getenv('TRACK_REFRESH_INTERVAL', '3600')),  # How often the refresher checks
+    'page_size': 100,  # Spotify's maximum for playlist items
+    'max_tracks_per_playlist': int(os.getenv('TRACK_MAX_PER_PLAYLIST', '2000')),
+    'pool_size': 10,  # Pooled HTTP connections to the Spotify API
+    'request_timeout': 10
+}
+
+# Emotion-vector recommendations - nearest tracks in valence/energy space (see track_features.py)
+RECOMMENDER_SETTINGS = {
+    'features_path': os.getenv('TRACK_FEATURES_PATH'),  # Directory written by track_features.py; unset = off
+    'top_k': int(os.getenv('TRACK_FEATURES_TOP_K', '25')),  # A song is drawn from this many nearest tracks
+    'max_query_k': 100,  # Largest k accepted by /recommend
+    'nprobe': int(os.getenv('TRACK_FEATURES_NPROBE', '8')),  # IVF lists scanned per query
+    'approximate_min_tracks': 100000  # Smaller catalogs are always searched exactly
+}
+
 # File paths - Use temp directory for deployment
-HAAR_CASCADE_PATH = './haarcascade_frontalface_default.xml'
+HAAR_CASCADE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'haarcascade_frontalface_default.xml')
 CAPTURED_IMAGE_PATH = os.getenv('CAPTURED_IMAGE_PATH', '/tmp/saved_img.jpg')
 PROCESSED_IMAGE_PATH = os.getenv('PROCESSED_IMAGE_PATH', '/tmp/saved_img-final.jpg')
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Emotion detector registry
+Backends are described by module and class name and imported only when a detector
+is built, so processes that never analyze a frame (or run the fallback backend)
+never import TensorFlow. Availability is checked with importlib.util.find_spec,
+which locates a package without importing it, and for model files with os.path.exists.
+"""
+import importlib
+import importlib.util
+import logging
+import os
+from collections import namedtuple
+from config import ONNX_SETTINGS
+from onnx_weights import model_weights
+
+logger = logging.getLogger(__name__)
+
+DetectorBackend = namedtuple('DetectorBackend', ['name', 'module', 'class_name', 'label', 'requires', 'files'])
+
+# Preference order for 'auto'
+BACKENDS = {}
+
+def register_backend(name, module, class_name, label, requires=(), files=()):
+    """Add a backend; requires lists top-level packages that must be installed for it, files the model files."""
+    BACKENDS[name] = DetectorBackend(name, module, class_name, label, tuple(requires), tuple(files))
+
+register_backend('deepface', 'emotion_deepface', 'DeepFaceEmotionDetector', 'DeepFace',
+                 requires=('tensorflow', 'deepface'))
+# The file for the configured precision (e.g. <model>.int8.onnx), as the detector will load it
+register_backend('onnx', 'emotion_onnx', 'OnnxEmotionDetector', 'ONNX',
+                 files=(model_weights(ONNX_SETTINGS['model_path'], ONNX_SETTINGS['precision'].lower(),
+                                      ONNX_SETTINGS['runtime']),))
+register_backend('fallback', 'emotion_fallback', 'FallbackEmotionDetector', 'Fallback')
+
+def backend_available(name):
+    """True if the backend's packages are installed and its model files exist (nothing is imported)."""
+    return not missing_requirements(name) if name in BACKENDS else False
+
+def missing_requirements(name):
+    """Packages and files the backend needs that are not there."""
+    backend = BACKENDS[name]
+    return ([p for p in backend.requires if importlib.util.find_spec(p) is None] +
+            [f for f in backend.files if not os.path.exists(f)])
+
+def available_backends():
+    return [name for name in BACKENDS if backend_available(name)]
+
+def resolve_backend(preferred='auto'):
+    """
+    Backend name to use: the preferred one if installed, the first installed one for 'auto'.
+    An unavailable explicit choice falls back to 'fallback' with a warning.
+    """
+    preferred = (preferred or 'auto').lower()
+    if preferred == 'auto':
+        return available_backends()[0]
+
+    if preferred not in BACKENDS:
+        raise ValueError(f"Unknown emotion detector '{preferred}', expected one of {['auto'] + list(BACKENDS)}")
+
+    if not backend_available(preferred):
+        missing = missing_requirements(preferred)
+        logger.warning(f"Emotion detector '{preferred}' unavailable (missing {', '.join(missing)}), using fallback")
+        return 'fallback'
+
+    return preferred
+
+def backend_label(name):
+    """Display name reported by /health and /metrics."""
+    return BACKENDS[name].label
+
+def build_detector(name):
+    """Import the backend module and create its detector."""
+    backend = BACKENDS[name]
+    module = importlib.import_module(backend.module)
+    return getattr(module, backend.class_name)()
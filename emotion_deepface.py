@@ -0,0 +1,53 @@
+"""
+DeepFace emotion detection
+Runs the DeepFace emotion model on micro-batches of Haar-cascade face crops (see
+face_emotion.py for the shared pipeline).
+TensorFlow and DeepFace are imported when the model is first loaded, not at import time.
+"""
+import importlib.util
+import logging
+import os
+from face_emotion import EMOTION_LABELS, FaceEmotionDetector
+
+# Set by load_deepface() on first model load
+DeepFace = None
+
+logger = logging.getLogger(__name__)
+
+# Input size of the DeepFace emotion model (its output order is EMOTION_LABELS)
+FACE_SIZE = (48, 48)
+
+def deepface_installed():
+    """True if DeepFace is importable (or already loaded), without importing it."""
+    return DeepFace is not None or importlib.util.find_spec('deepface') is not None
+
+def load_deepface():
+    """Import TensorFlow and DeepFace (slow, hundreds of MB) the first time the model is needed."""
+    global DeepFace
+    if DeepFace is None:
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+        import tensorflow as tf
+        tf.get_logger().setLevel('ERROR')
+
+        from deepface import DeepFace as deepface_module
+        DeepFace = deepface_module
+        logger.info("DeepFace + TensorFlow loaded")
+    return DeepFace
+
+class DeepFaceEmotionDetector(FaceEmotionDetector):
+    """Emotion detector backed by the DeepFace emotion model"""
+
+    label = 'DeepFace'
+    model_labels = EMOTION_LABELS
+    face_size = FACE_SIZE
+
+    def __init__(self):
+        if not deepface_installed():
+            raise ImportError("DeepFace is not installed")
+        super().__init__()
+
+    def _load_model(self):
+        return load_deepface().build_model('Emotion')
+
+    def _predict(self, model, faces):
+        return model.predict(faces, verbose=0)
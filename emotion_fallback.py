@@ -1,103 +1,192 @@
 """
 Fallback emotion detection system that doesn't require TensorFlow/DeepFace
-Uses simple image analysis and random selection for demo purposes
+Scores emotions from a small vector of image statistics (brightness, contrast,
+histogram moments) computed in NumPy on a reduced grayscale image, and samples the
+dominant emotion with a per-instance seeded RNG. Whole batches are scored and
+sampled in one vectorized step.
 """
 import cv2
 import numpy as np
-import random
 import logging
+import threading
+from config import FALLBACK_SETTINGS
+from frame_ingest import decode_data_url
 
 logger = logging.getLogger(__name__)
 
+EMOTIONS = ('happy', 'sad', 'angry', 'neutral', 'fear', 'surprise', 'disgust')
+
+# Reduced-size grayscale decodes: the detector only needs coarse statistics
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+# Statistics -> features as one affine map, clipped to the ranges below:
+# bright = (brightness - 100) / 40, dark = (110 - brightness) / 40, contrast = std / 64, skew
+FEATURE_SCALE = np.array([
+    [1 / 40.0, -1 / 40.0, 0.0, 0.0],
+    [0.0, 0.0, 1 / 64.0, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+    [0.0, 0.0, 0.0, 0.0]
+])
+FEATURE_OFFSET = np.array([-100 / 40.0, 110 / 40.0, 0.0, 0.0])
+FEATURE_MIN = np.array([0.0, 0.0, 0.0, -2.0])
+FEATURE_MAX = np.array([1.0, 1.0, 1.0, 2.0])
+
+# Per-emotion base weight, then the weight added by each feature
+# (same heuristics as before: bright frames lean happy, dark frames lean sad)
+BASE_WEIGHTS = np.array([0.1, 0.1, 0.1, 0.4, 0.05, 0.1, 0.05])
+STAT_WEIGHTS = np.array([
+    # bright, dark, contrast, skew
+    [0.20, 0.00, 0.02, -0.02],  # happy
+    [0.00, 0.10, 0.00, 0.02],   # sad
+    [0.00, 0.00, 0.03, 0.00],   # angry
+    [0.00, 0.00, -0.05, 0.00],  # neutral
+    [0.00, 0.02, 0.00, 0.00],   # fear
+    [0.00, 0.00, 0.03, 0.00],   # surprise
+    [0.00, 0.00, 0.00, 0.00],   # disgust
+])
+
 class FallbackEmotionDetector:
     """Simple emotion detector that works without heavy ML dependencies"""
-    
-    def __init__(self):
-        self.emotions = ['happy', 'sad', 'angry', 'neutral', 'fear', 'surprise', 'disgust']
-        
+
+    def __init__(self, seed=None, decode_reduction=None, stats_width=None):
+        self.emotions = list(EMOTIONS)
+        self.seed = FALLBACK_SETTINGS['seed'] if seed is None else seed
+        self.decode_flags = REDUCED_GRAYSCALE_FLAGS[decode_reduction or FALLBACK_SETTINGS['decode_reduction']]
+        self.stats_width = int(stats_width or FALLBACK_SETTINGS['stats_width'])
+
+        self._rng = np.random.default_rng(self.seed)
+        self._rng_lock = threading.Lock()  # Generators are not thread-safe; draws are tiny
+        self._levels = np.arange(256, dtype=np.float64)
+
     def analyze_emotion_from_base64(self, image_data):
+        """Decode a base64 data URL straight to reduced grayscale and analyze it"""
+        try:
+            img = decode_data_url(image_data, self.decode_flags)
+        except Exception as e:
+            return self._random_result(e)
+
+        return self.analyze_emotion_from_frame(img)
+
+    def analyze_emotion_from_frame(self, img):
         """
         Fallback emotion analysis using simple image properties
-        Returns random emotion with realistic confidence scores
+        Returns a weighted random emotion with realistic confidence scores
         """
-        try:
-            # For demo: analyze basic image properties and return weighted random emotion
-            
-            # Decode image for basic analysis
-            import base64
-            image_data = image_data.split(',')[1]
-            image_bytes = base64.b64decode(image_data)
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                raise Exception("Could not decode image")
-            
-            # Simple image analysis
-            brightness = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
-            
-            # Weight emotions based on simple heuristics
-            emotion_weights = {
-                'happy': 0.3 if brightness > 120 else 0.1,
-                'neutral': 0.4,
-                'sad': 0.2 if brightness < 100 else 0.1,
-                'angry': 0.1,
-                'fear': 0.05,
-                'surprise': 0.1,
-                'disgust': 0.05
-            }
-            
-            # Normalize weights
-            total_weight = sum(emotion_weights.values())
-            emotion_weights = {k: v/total_weight for k, v in emotion_weights.items()}
-            
-            # Select emotion based on weights (without numpy.random.choice)
-            import random
-            rand_val = random.random()
-            cumulative = 0
-            dominant_emotion = 'neutral'  # default
-            
-            for emotion, weight in emotion_weights.items():
-                cumulative += weight
-                if rand_val <= cumulative:
-                    dominant_emotion = emotion
-                    break
-            
-            # Generate realistic confidence scores
-            base_confidence = random.uniform(0.6, 0.9)
-            emotion_scores = {}
-            
-            for emotion in self.emotions:
-                if emotion == dominant_emotion:
-                    emotion_scores[emotion] = base_confidence * 100
-                else:
-                    emotion_scores[emotion] = random.uniform(0.01, 0.15) * 100
-            
-            # Normalize to 100%
-            total = sum(emotion_scores.values())
-            emotion_scores = {k: (v/total) * 100 for k, v in emotion_scores.items()}
-            
-            logger.info(f"Fallback detector: {dominant_emotion} ({emotion_scores[dominant_emotion]:.1f}%)")
-            
-            return {
-                'dominant_emotion': dominant_emotion,
-                'emotion_scores': {k: round(v, 2) for k, v in emotion_scores.items()},
-                'success': True,
-                'detector': 'Fallback (Image Analysis)',
-                'confidence': round(emotion_scores[dominant_emotion], 2),
-                'brightness': round(brightness, 1)
-            }
-            
-        except Exception as e:
-            logger.error(f"Fallback emotion analysis failed: {e}")
-            
-            # Ultimate fallback - pure random
-            fallback_emotion = random.choice(['happy', 'neutral', 'sad'])
-            return {
-                'dominant_emotion': fallback_emotion,
-                'emotion_scores': {fallback_emotion: 75.0, 'neutral': 25.0},
-                'success': False,
-                'error': str(e),
-                'detector': 'Random Fallback',
-                'confidence': 75.0
-            }
\ No newline at end of file
+        return self.analyze_frames([img])[0]
+
+    def analyze_frames(self, frames):
+        """Analyze a list of decoded frames; scoring and sampling run once for the whole batch"""
+        results = [None] * len(frames)
+        stats = []
+        valid = []
+
+        for index, img in enumerate(frames):
+            try:
+                stats.append(self.image_stats(img))
+                valid.append(index)
+            except Exception as e:
+                results[index] = self._random_result(e)
+
+        if valid:
+            stats = np.stack(stats)
+            dominant, scores = self._sample(self._emotion_weights(stats))
+            for row, index in enumerate(valid):
+                results[index] = self._build_result(dominant[row], scores[row], stats[row, 0])
+
+        return results
+
+    def image_stats(self, img):
+        """[brightness, contrast, skewness, kurtosis] of a frame, from a grayscale histogram of a small view"""
+        if img is None or img.size == 0:
+            raise ValueError("Could not decode image")
+
+        # Nearest-neighbour shrink (pixel subsampling, no filtering) before the color conversion
+        height, width = img.shape[:2]
+        if width > self.stats_width:
+            size = (self.stats_width, max(1, height * self.stats_width // width))
+            img = cv2.resize(img, size, interpolation=cv2.INTER_NEAREST)
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.float64)
+        p = hist / hist.sum()
+        mean = p @ self._levels
+        centered = self._levels - mean
+        variance = p @ (centered * centered)
+        std = np.sqrt(variance)
+        if std > 0:
+            z = centered / std
+            skew = p @ (z ** 3)
+            kurtosis = p @ (z ** 4) - 3.0
+        else:
+            skew = kurtosis = 0.0
+
+        return np.array([mean, std, skew, kurtosis])
+
+    def _emotion_weights(self, stats):
+        """(N, 4) statistics -> (N, 7) normalized sampling weights"""
+        features = np.clip(stats @ FEATURE_SCALE + FEATURE_OFFSET, FEATURE_MIN, FEATURE_MAX)
+        weights = np.clip(BASE_WEIGHTS + features @ STAT_WEIGHTS.T, 0.01, None)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def _sample(self, weights):
+        """One vectorized draw: dominant emotion index per row and percentage scores (N, 7)"""
+        n = len(weights)
+        with self._rng_lock:
+            uniforms = self._rng.random((n, len(EMOTIONS) + 2))
+
+        # Column 0 picks the emotion, column 1 its confidence (0.6-0.9), the rest the others' scores (0.01-0.15)
+        draws = uniforms[:, :1]
+        base_confidence = 0.6 + 0.3 * uniforms[:, 1]
+        scores = 0.01 + 0.14 * uniforms[:, 2:]
+
+        # Inverse-CDF sampling; the min() guards against rounding leaving no column above the draw
+        dominant = np.minimum((np.cumsum(weights, axis=1) < draws).sum(axis=1), len(EMOTIONS) - 1)
+        scores[np.arange(n), dominant] = base_confidence
+        scores *= 100.0 / scores.sum(axis=1, keepdims=True)
+        return dominant, np.round(scores, 2)
+
+    def _build_result(self, dominant, scores, brightness):
+        dominant_emotion = EMOTIONS[dominant]
+        confidence = float(scores[dominant])
+        logger.info(f"Fallback detector: {dominant_emotion} ({confidence:.1f}%)")
+
+        return {
+            'dominant_emotion': dominant_emotion,
+            'emotion_scores': dict(zip(EMOTIONS, scores.tolist())),
+            'success': True,
+            'detector': 'Fallback (Image Analysis)',
+            'confidence': confidence,
+            'brightness': round(float(brightness), 1)
+        }
+
+    def analyze_faces(self, img, max_faces=None):
+        """Multi-face mode: without a face detector the whole frame counts as one face"""
+        result = self.analyze_emotion_from_frame(img)
+        result['face_count'] = 1 if result.get('success') else 0
+        result['faces'] = [{
+            'face_box': None,
+            'dominant_emotion': result['dominant_emotion'],
+            'emotion_scores': result['emotion_scores'],
+            'confidence': result.get('confidence', 0.0)
+        }] if result.get('success') else []
+        return result
+
+    def _random_result(self, error):
+        """Ultimate fallback - pure random"""
+        logger.error(f"Fallback emotion analysis failed: {error}")
+
+        with self._rng_lock:
+            fallback_emotion = ('happy', 'neutral', 'sad')[int(self._rng.integers(3))]
+        return {
+            'dominant_emotion': fallback_emotion,
+            'emotion_scores': {fallback_emotion: 75.0, 'neutral': 25.0},
+            'success': False,
+            'error': str(error),
+            'detector': 'Random Fallback',
+            'confidence': 75.0
+        }
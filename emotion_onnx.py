@@ -0,0 +1,176 @@
+"""
+ONNX emotion detection
+Runs a small emotion-classification network (FER+ layout by default: 64x64 grayscale,
+8 classes) on CPU through OpenCV's dnn module, or through onnxruntime when it is installed
+and selected. No TensorFlow is involved. Face crops, micro-batching and the result
+schema are shared with the DeepFace backend (face_emotion.py).
+
+    python emotion_onnx.py convert --precision int8   # writes <model>.int8.onnx (needs onnxruntime)
+    python emotion_onnx.py convert --precision fp16   # writes <model>.fp16.onnx (needs onnxconverter-common)
+"""
+import argparse
+import cv2
+import logging
+import os
+import threading
+import numpy as np
+from config import ONNX_SETTINGS
+from face_emotion import EMOTION_LABELS, FaceEmotionDetector
+from onnx_weights import PRECISIONS, RUNTIMES, model_weights, resolve_runtime, weights_path
+
+logger = logging.getLogger(__name__)
+
+# Model class names -> result labels; classes without a counterpart are folded into the closest one
+LABEL_ALIASES = {
+    'happiness': 'happy',
+    'sadness': 'sad',
+    'anger': 'angry',
+    'surprised': 'surprise',
+    'contempt': 'disgust'
+}
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+class OpenCVEmotionModel:
+    """cv2.dnn network; falls back to one forward pass per crop if the graph has a fixed batch of 1"""
+
+    runtime = 'opencv'
+
+    def __init__(self, path, precision, threads):
+        self.net = cv2.dnn.readNetFromONNX(path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        if precision == 'fp16' and hasattr(cv2.dnn, 'DNN_TARGET_CPU_FP16'):
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU_FP16)
+        else:
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        if threads:
+            cv2.setNumThreads(threads)  # Process-wide: OpenCV has one thread pool
+
+        self.batched = True
+        self._lock = threading.Lock()  # A Net keeps its blobs between setInput and forward
+
+    def run(self, blob):
+        with self._lock:
+            if self.batched:
+                try:
+                    self.net.setInput(blob)
+                    out = self.net.forward()
+                except cv2.error as e:
+                    if len(blob) == 1:
+                        raise
+                    logger.warning(f"Batched forward pass failed, running crops one at a time: {e}")
+                    self.batched = False
+                else:
+                    if out.shape[0] == len(blob):
+                        return out.reshape(len(blob), -1)
+                    # A graph fixed to batch 1 may return one row for the whole blob instead of failing
+                    logger.warning(f"Batched forward pass returned {out.shape[0]} rows for {len(blob)} crops, "
+                                   f"running crops one at a time")
+                    self.batched = False
+
+            outputs = []
+            for sample in blob:
+                self.net.setInput(sample[None])
+                outputs.append(self.net.forward().reshape(1, -1))
+            return np.concatenate(outputs)
+
+class OnnxRuntimeEmotionModel:
+    """onnxruntime CPU session; thread-safe, batched when the graph's batch dimension is dynamic"""
+
+    runtime = 'onnxruntime'
+
+    def __init__(self, path, precision, threads):
+        import onnxruntime as ort  # Optional dependency
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_type = np.float16 if model_input.type == 'tensor(float16)' else np.float32
+        self.batched = not isinstance(model_input.shape[0], int) or model_input.shape[0] != 1
+
+    def run(self, blob):
+        blob = blob.astype(self.input_type, copy=False)
+        if self.batched:
+            return self.session.run(None, {self.input_name: blob})[0].reshape(len(blob), -1).astype(np.float32)
+        return np.concatenate([
+            self.session.run(None, {self.input_name: sample[None]})[0].reshape(1, -1) for sample in blob
+        ]).astype(np.float32)
+
+class OnnxEmotionDetector(FaceEmotionDetector):
+    """Emotion detector backed by an ONNX classification network on CPU"""
+
+    label = 'ONNX'
+
+    def __init__(self, model_path=None, runtime=None, precision=None, threads=None):
+        self.model_path = model_path or ONNX_SETTINGS['model_path']
+        self.precision = (precision or ONNX_SETTINGS['precision']).lower()
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"ONNX precision must be one of {PRECISIONS}")
+
+        runtime = (runtime or ONNX_SETTINGS['runtime']).lower()
+        if runtime not in RUNTIMES:
+            raise ValueError(f"ONNX runtime must be one of {RUNTIMES}")
+        self.runtime = resolve_runtime(runtime)
+        self.threads = ONNX_SETTINGS['threads'] if threads is None else int(threads)
+
+        self.weights = model_weights(self.model_path, self.precision, self.runtime)
+        if not os.path.exists(self.weights):
+            raise FileNotFoundError(f"ONNX emotion model not found: {self.weights}")
+
+        size = ONNX_SETTINGS['input_size']
+        self.face_size = (size, size)
+        self.model_labels = [LABEL_ALIASES.get(label, label) for label in ONNX_SETTINGS['labels']]
+        unknown = set(self.model_labels) - set(EMOTION_LABELS)
+        if unknown:
+            raise ValueError(f"ONNX emotion labels without a result label: {sorted(unknown)}")
+        self.input_scale = ONNX_SETTINGS['input_scale']
+        self.apply_softmax = ONNX_SETTINGS['softmax']
+
+        super().__init__()
+
+    def _load_model(self):
+        model_class = OnnxRuntimeEmotionModel if self.runtime == 'onnxruntime' else OpenCVEmotionModel
+        model = model_class(self.weights, self.precision, self.threads)
+        logger.info(f"ONNX emotion model loaded from {self.weights} ({self.runtime}, {self.precision}, "
+                    f"{'batched' if model.batched else 'batch of 1'})")
+        return model
+
+    def _predict(self, model, faces):
+        # (N, H, W, 1) in 0-1 -> NCHW at the scale the network was trained on
+        blob = np.ascontiguousarray(faces.transpose(0, 3, 1, 2)) * self.input_scale
+        scores = model.run(blob)
+        return softmax(scores) if self.apply_softmax else scores
+
+def convert(model_path, precision):
+    """Write reduced-precision weights next to the fp32 model."""
+    target = weights_path(model_path, precision)
+    if precision == 'int8':
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, target, weight_type=QuantType.QUInt8)
+    elif precision == 'fp16':
+        import onnx
+        from onnxconverter_common import float16
+        model = float16.convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+        onnx.save(model, target)
+    else:
+        raise ValueError("Nothing to convert for fp32")
+    return target
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prepare reduced-precision ONNX emotion weights')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help='Write int8 (dynamic quantization) or fp16 weights')
+    convert_parser.add_argument('--model', default=ONNX_SETTINGS['model_path'])
+    convert_parser.add_argument('--precision', choices=['int8', 'fp16'], required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"⚙️ Wrote {convert(args.model, args.precision)}")
@@ -0,0 +1,82 @@
+"""
+Temporal smoothing of emotion scores
+Keeps an exponentially weighted average of the per-emotion scores so one noisy
+frame does not flip the dominant emotion. Also combines the scores of several
+faces in one frame into a group emotion.
+"""
+
+def aggregate_emotions(face_results):
+    """
+    Group emotion for several faces: the mean of their score dicts.
+    Only successful results count. Returns (dominant_emotion, scores), or (None, {}) when none succeeded.
+    """
+    score_dicts = [r['emotion_scores'] for r in face_results if r.get('success') and r.get('emotion_scores')]
+    if not score_dicts:
+        return None, {}
+
+    labels = set().union(*score_dicts)
+    scores = {
+        label: round(sum(float(d.get(label, 0.0)) for d in score_dicts) / len(score_dicts), 2)
+        for label in labels
+    }
+    return max(scores, key=scores.get), scores
+
+class EmotionSmoother:
+    """Exponentially weighted emotion vector with hysteresis on the dominant emotion"""
+
+    __slots__ = ('alpha', 'switch_margin', 'scores', 'dominant_emotion', 'updates')
+
+    def __init__(self, alpha=0.3, switch_margin=5.0):
+        self.alpha = float(alpha)
+        self.switch_margin = float(switch_margin)
+        self.scores = {}
+        self.dominant_emotion = None
+        self.updates = 0
+
+    def update(self, emotion_scores):
+        """Blend a new score dict (percentages) into the average. Returns True if the dominant emotion changed."""
+        if not emotion_scores:
+            return False
+
+        if not self.scores:
+            self.scores = {k: float(v) for k, v in emotion_scores.items()}
+        else:
+            labels = set(self.scores) | set(emotion_scores)
+            self.scores = {
+                label: (1.0 - self.alpha) * self.scores.get(label, 0.0) + self.alpha * float(emotion_scores.get(label, 0.0))
+                for label in labels
+            }
+        self.updates += 1
+
+        leader = max(self.scores, key=self.scores.get)
+        if self.dominant_emotion is None:
+            self.dominant_emotion = leader
+            return True
+
+        # Only switch when the new leader is clearly ahead of the current one
+        if leader != self.dominant_emotion:
+            lead = self.scores[leader] - self.scores.get(self.dominant_emotion, 0.0)
+            if lead >= self.switch_margin:
+                self.dominant_emotion = leader
+                return True
+
+        return False
+
+    def confidence(self):
+        """Smoothed score of the dominant emotion."""
+        if self.dominant_emotion is None:
+            return 0.0
+        return self.scores.get(self.dominant_emotion, 0.0)
+
+    def snapshot(self):
+        """Rounded copy of the smoothed state."""
+        return {
+            'dominant_emotion': self.dominant_emotion,
+            'smoothed_scores': {k: round(v, 2) for k, v in self.scores.items()},
+            'confidence': round(self.confidence(), 2)
+        }
+
+    def reset(self):
+        self.scores = {}
+        self.dominant_emotion = None
+        self.updates = 0
@@ -0,0 +1,260 @@
+"""
+Shared pipeline for face-crop emotion classifiers
+Crops the face with the bundled Haar cascade, runs an emotion model on micro-batches of
+crops and builds the /analyze result dict. Backends (DeepFace, ONNX) only load the model
+and turn a stack of crops into per-class scores. Kept free of Flask so inference worker
+processes can build it.
+"""
+import abc
+import cv2
+import logging
+import random
+import threading
+import numpy as np
+from config import BATCH_SETTINGS, FACE_DETECTION_SETTINGS, HAAR_CASCADE_PATH
+from emotion_smoothing import aggregate_emotions
+from face_preprocessing import FacePreprocessor
+from frame_ingest import decode_data_url
+from metrics import stage_timer
+from micro_batcher import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# Labels reported in results, whatever the model's own class names
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+class FaceEmotionDetector(abc.ABC):
+    """Base class: subclasses implement _load_model() and _predict(model, faces)"""
+
+    label = 'Face model'
+    model_labels = EMOTION_LABELS  # Class order of the model output
+    face_size = (48, 48)
+
+    def __init__(self):
+        # Haar cascade is loaded once; the emotion model only sees the cropped face
+        try:
+            self.face_preprocessor = FacePreprocessor(
+                HAAR_CASCADE_PATH,
+                detection_width=FACE_DETECTION_SETTINGS['detection_width'],
+                scale_factor=FACE_DETECTION_SETTINGS['scale_factor'],
+                min_neighbors=FACE_DETECTION_SETTINGS['min_neighbors'],
+                min_face_size=FACE_DETECTION_SETTINGS['min_face_size'],
+                crop_margin=FACE_DETECTION_SETTINGS['crop_margin']
+            )
+        except Exception as e:
+            logger.error(f"Face preprocessor unavailable, analyzing full frames: {e}")
+            self.face_preprocessor = None
+
+        # Emotion model is loaded on first use; concurrent frames share one forward pass
+        self.emotion_model = None
+        self._model_lock = threading.Lock()
+        self.batcher = MicroBatcher(
+            self._predict_emotion_batch,
+            max_batch_size=BATCH_SETTINGS['max_batch_size'] if BATCH_SETTINGS['enabled'] else 1,
+            max_wait_ms=BATCH_SETTINGS['max_wait_ms'] if BATCH_SETTINGS['enabled'] else 0,
+            name='emotion-batcher'
+        )
+
+    @abc.abstractmethod
+    def _load_model(self):
+        """Load and return the emotion model."""
+
+    @abc.abstractmethod
+    def _predict(self, model, faces):
+        """(N, H, W, 1) float32 crops in 0-1 -> (N, len(model_labels)) scores."""
+
+    def _get_emotion_model(self):
+        """Load the emotion model once."""
+        if self.emotion_model is None:
+            with self._model_lock:
+                if self.emotion_model is None:
+                    self.emotion_model = self._load_model()
+        return self.emotion_model
+
+    def warmup(self, frame_size=(480, 640), forward_pass=True):
+        """
+        Load the model and run it once on a dummy frame. With forward_pass=False only the weights
+        are loaded: a preloading gunicorn master must not start the framework's thread pools before forking.
+        """
+        logger.info(f"Warming up {self.label} emotion model...")
+        self._get_emotion_model()
+        if not forward_pass:
+            return
+
+        height, width = frame_size
+        dummy_frame = np.full((height, width, 3), 127, dtype=np.uint8)
+
+        # Run the model directly: the batcher thread must only start after gunicorn forks
+        self._predict_emotion_batch([self._model_input(dummy_frame)])
+
+    def _model_input(self, img, box=None):
+        """Crop (or shrink the whole frame) to the normalized grayscale emotion-model input."""
+        if self.face_preprocessor is not None:
+            crop = self.face_preprocessor.crop(img, box, size=self.face_size)
+        else:
+            crop = cv2.resize(img, self.face_size, interpolation=cv2.INTER_AREA)
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+
+        face = crop.astype(np.float32) / 255.0
+        return face.reshape(self.face_size[::-1] + (1,))
+
+    def _extract_face(self, img):
+        """Find the largest face; returns (model_input, box) or (None, None) when no face is found and skipping is on."""
+        if self.face_preprocessor is None:
+            return self._model_input(img), None
+
+        with stage_timer('face_detect'):
+            box = self.face_preprocessor.detect_largest_face(img)
+        if box is None and FACE_DETECTION_SETTINGS['skip_on_no_face']:
+            return None, None
+
+        return self._model_input(img, box), box
+
+    def _predict_emotion_batch(self, faces):
+        """Run the emotion model once over a stack of face crops."""
+        model = self._get_emotion_model()
+        with stage_timer('model'):
+            predictions = self._predict(model, np.stack(faces))
+        return list(predictions)
+
+    def _emotion_percentages(self, prediction):
+        """One row of model scores -> percentages over EMOTION_LABELS (classes outside it are folded in by alias)."""
+        total = float(np.sum(prediction)) or 1.0
+        percentages = dict.fromkeys(EMOTION_LABELS, 0.0)
+        for label, score in zip(self.model_labels, prediction):
+            percentages[label] = percentages.get(label, 0.0) + 100.0 * float(score) / total
+        return {label: round(value, 2) for label, value in percentages.items()}
+
+    def _build_result(self, prediction, box=None):
+        """Turn one row of model output into the /analyze result dict."""
+        emotion_percentages = self._emotion_percentages(prediction)
+        dominant_emotion = max(emotion_percentages, key=emotion_percentages.get)
+
+        logger.info(f"{self.label} detected emotion: {dominant_emotion}")
+
+        return {
+            'dominant_emotion': dominant_emotion,
+            'emotion_scores': emotion_percentages,
+            'success': True,
+            'detector': self.label,
+            'confidence': emotion_percentages.get(dominant_emotion, 0.0),
+            'face_detected': box is not None,
+            'face_box': list(box) if box is not None else None
+        }
+
+    def _no_face_result(self):
+        """Fast result when the cascade finds no face; the model is not run."""
+        return {
+            'dominant_emotion': 'neutral',
+            'emotion_scores': {},
+            'success': False,
+            'detector': self.label,
+            'confidence': 0.0,
+            'face_detected': False,
+            'face_box': None,
+            'message': 'No face detected'
+        }
+
+    def _failure_result(self, error):
+        """Random emotion used when analysis fails."""
+        logger.error(f"{self.label} emotion analysis failed: {error}")
+        emotions = ['happy', 'sad', 'angry', 'neutral', 'fear']
+        fallback_emotion = random.choice(emotions)
+
+        return {
+            'dominant_emotion': fallback_emotion,
+            'emotion_scores': {fallback_emotion: 85.0, 'neutral': 15.0},
+            'success': False,
+            'error': str(error),
+            'detector': 'Fallback (Random)',
+            'message': f'{self.label} failed, using fallback: {fallback_emotion}'
+        }
+
+    def analyze_emotion_from_base64(self, image_data):
+        """Decode a base64 data URL and analyze it."""
+        try:
+            img = decode_data_url(image_data)
+        except Exception as e:
+            return self._failure_result(e)
+
+        return self.analyze_emotion_from_frame(img)
+
+    def analyze_emotion_from_frame(self, img):
+        """Analyze one decoded BGR frame; concurrent callers share a batched forward pass."""
+        try:
+            logger.info(f"Analyzing emotion with {self.label}...")
+            face, box = self._extract_face(img)
+            if face is None:
+                return self._no_face_result()
+
+            prediction = self.batcher.run(face)
+
+            return self._build_result(prediction, box)
+
+        except Exception as e:
+            return self._failure_result(e)
+
+    def analyze_faces(self, img, max_faces=None):
+        """
+        Multi-face mode: detect every face once, run all crops through the model as one batch
+        and return per-face results plus the group emotion (mean of the face scores).
+        """
+        try:
+            if self.face_preprocessor is None:
+                boxes = [None]
+            else:
+                with stage_timer('face_detect'):
+                    boxes = self.face_preprocessor.detect_faces(img)[:max_faces or FACE_DETECTION_SETTINGS['max_faces']]
+
+            if not boxes:
+                result = self._no_face_result()
+                result.update({'face_count': 0, 'faces': []})
+                return result
+
+            predictions = self.batcher.run_many([self._model_input(img, box) for box in boxes])
+            faces = [self._build_result(prediction, box) for prediction, box in zip(predictions, boxes)]
+            group_emotion, group_scores = aggregate_emotions(faces)
+
+            logger.info(f"{self.label} group emotion over {len(faces)} face(s): {group_emotion}")
+
+            return {
+                'dominant_emotion': group_emotion,
+                'emotion_scores': group_scores,
+                'success': True,
+                'detector': self.label,
+                'confidence': group_scores.get(group_emotion, 0.0),
+                'face_detected': boxes[0] is not None,
+                'face_count': len(faces),
+                'faces': [
+                    {key: face[key] for key in ('face_box', 'dominant_emotion', 'emotion_scores', 'confidence')}
+                    for face in faces
+                ]
+            }
+
+        except Exception as e:
+            return self._failure_result(e)
+
+    def analyze_frames(self, frames):
+        """Analyze several decoded frames, running all detected faces through the model together."""
+        results = [None] * len(frames)
+        pending = []
+
+        # Detect every face before queueing any crop: a Haar pass outlasts the batcher's wait window
+        for index, img in enumerate(frames):
+            try:
+                face, box = self._extract_face(img)
+                if face is None:
+                    results[index] = self._no_face_result()
+                    continue
+                pending.append((index, box, face))
+            except Exception as e:
+                results[index] = self._failure_result(e)
+
+        futures = self.batcher.submit_many([face for _, _, face in pending])
+        for (index, box, _), future in zip(pending, futures):
+            try:
+                results[index] = self._build_result(future.result(), box)
+            except Exception as e:
+                results[index] = self._failure_result(e)
+
+        return results
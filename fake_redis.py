@@ -0,0 +1,162 @@
+"""
+Local stand-in for a Redis server, for testing the shared session store without Redis
+Speaks enough of the Redis protocol for redis-py: PING, GET, SET [EX|PX|NX], DEL, EXISTS,
+EXPIRE, TTL, FLUSHDB, SELECT, plus the HELLO/CLIENT handshakes (RESP2 or RESP3).
+Data lives in memory only.
+
+    python fake_redis.py --port 6390
+    SESSION_STORE_URL=redis://127.0.0.1:6390/0 gunicorn -w 4 app:app
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class RespError(Exception):
+    pass
+
+class Store:
+    """Thread-safe key/value map with per-key expiry"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def execute(self, command, args):
+        with self._lock:
+            if command == 'PING':
+                return args[0] if args else 'PONG'
+            if command == 'GET':
+                return self._data[args[0]] if self._alive(args[0]) else None
+            if command == 'SET':
+                return self._set(args)
+            if command == 'DEL':
+                removed = sum(1 for key in args if self._alive(key))
+                for key in args:
+                    self._data.pop(key, None)
+                    self._expires.pop(key, None)
+                return removed
+            if command == 'EXISTS':
+                return sum(1 for key in args if self._alive(key))
+            if command == 'EXPIRE':
+                if not self._alive(args[0]):
+                    return 0
+                self._expires[args[0]] = time.monotonic() + int(args[1])
+                return 1
+            if command == 'TTL':
+                if not self._alive(args[0]):
+                    return -2
+                expires = self._expires.get(args[0])
+                return -1 if expires is None else max(0, int(round(expires - time.monotonic())))
+            if command == 'FLUSHDB':
+                self._data.clear()
+                self._expires.clear()
+                return 'OK'
+            if command == 'HELLO':
+                protocol = int(args[0]) if args else 2
+                if protocol not in (2, 3):
+                    raise RespError('NOPROTO unsupported protocol version')
+                info = {'server': 'fake-redis', 'version': '7.0.0', 'proto': protocol, 'mode': 'standalone'}
+                return info if protocol == 3 else [item for pair in info.items() for item in pair]
+            if command in ('SELECT', 'CLIENT'):
+                return 'OK'
+        raise RespError(f"ERR unknown command '{command}'")
+
+    def _set(self, args):
+        key, value = args[0], args[1]
+        ttl = None
+        options = [arg.decode('ascii', 'replace').upper() for arg in args[2:]]
+        if 'NX' in options and self._alive(key):
+            return None
+        if 'EX' in options:
+            ttl = int(options[options.index('EX') + 1])
+        elif 'PX' in options:
+            ttl = int(options[options.index('PX') + 1]) / 1000.0
+
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+        return 'OK'
+
+def encode(value, protocol=2):
+    """Python value -> RESP2 (or RESP3) reply."""
+    if value is None:
+        return b'_\r\n' if protocol == 3 else b'$-1\r\n'
+    if isinstance(value, RespError):
+        return b'-' + str(value).encode('utf-8') + b'\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+' + value.encode('utf-8') + b'\r\n'
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item, protocol) for item in value)
+    if isinstance(value, dict):
+        # RESP3 map, only sent in reply to HELLO 3
+        return b'%%%d\r\n' % len(value) + b''.join(encode(k, protocol) + encode(v, protocol) for k, v in value.items())
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+def make_handler(store):
+    class FakeRedisHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            protocol = 2
+            while True:
+                try:
+                    parts = self._read_command()
+                except (ConnectionError, ValueError):
+                    return
+                if parts is None:
+                    return
+
+                command = parts[0].decode('ascii', 'replace').upper()
+                try:
+                    reply = store.execute(command, parts[1:])
+                    if command == 'HELLO':
+                        protocol = reply['proto'] if isinstance(reply, dict) else 2
+                except RespError as e:
+                    reply = e
+                except (IndexError, ValueError):
+                    reply = RespError(f"ERR wrong arguments for '{command}'")
+                self.wfile.write(encode(reply, protocol))
+                self.wfile.flush()
+
+        def _read_command(self):
+            """One request as a list of byte strings (arrays of bulk strings, as clients send)."""
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if not line.startswith(b'*'):
+                return line.split()  # Inline command, e.g. from telnet
+            parts = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                parts.append(self.rfile.read(length + 2)[:-2])
+            return parts
+
+    return FakeRedisHandler
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(port=6390):
+    """Create (but don't start) the fake Redis server."""
+    return FakeRedisServer(('127.0.0.1', port), make_handler(Store()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory Redis stand-in for offline testing')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    server = serve(args.port)
+    print(f"🗄️ Fake Redis on redis://127.0.0.1:{args.port}/0")
+    server.serve_forever()
@@ -0,0 +1,79 @@
+"""
+Local stand-in for the Spotify Web API, for offline testing of the track catalog
+Serves paginated playlist items with deterministic fake tracks.
+
+    python fake_spotify.py --port 8765 --tracks 250
+    SPOTIFY_CATALOG=true SPOTIFY_API_BASE=http://localhost:8765/v1 SPOTIFY_ACCESS_TOKEN=fake python app.py
+"""
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PLAYLIST_PATH = re.compile(r'^/v1/playlists/([A-Za-z0-9]+)/(?:tracks|items)$')
+
+def make_track(playlist_id, position):
+    track_id = f'{playlist_id[:12]}{position:010d}'
+    return {
+        'track': {
+            'id': track_id,
+            'name': f'Track {position + 1} of {playlist_id[:8]}',
+            'artists': [{'name': f'Artist {position % 17 + 1}'}],
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'}
+        }
+    }
+
+def make_handler(tracks_per_playlist):
+    class FakeSpotifyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = PLAYLIST_PATH.match(url.path)
+            if not match:
+                return self._send(404, {'error': {'status': 404, 'message': 'Not found'}})
+
+            query = parse_qs(url.query)
+            offset = int(query.get('offset', ['0'])[0])
+            limit = min(100, int(query.get('limit', ['100'])[0]))
+            playlist_id = match.group(1)
+
+            end = min(tracks_per_playlist, offset + limit)
+            next_url = None
+            if end < tracks_per_playlist:
+                host = self.headers.get('Host', 'localhost')
+                next_url = f'http://{host}{url.path}?offset={end}&limit={limit}'
+
+            self._send(200, {
+                'items': [make_track(playlist_id, i) for i in range(offset, end)],
+                'next': next_url,
+                'offset': offset,
+                'limit': limit,
+                'total': tracks_per_playlist
+            })
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeSpotifyHandler
+
+def serve(port=8765, tracks_per_playlist=250):
+    """Create (but don't start) the fake API server."""
+    return ThreadingHTTPServer(('127.0.0.1', port), make_handler(tracks_per_playlist))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Spotify Web API for offline testing')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tracks', type=int, default=250, help='Tracks per playlist')
+    args = parser.parse_args()
+
+    server = serve(args.port, args.tracks)
+    print(f"🎵 Fake Spotify API on http://127.0.0.1:{args.port}/v1 ({args.tracks} tracks per playlist)")
+    server.serve_forever()
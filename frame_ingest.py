@@ -0,0 +1,121 @@
+"""
+Frame ingest shared by every emotion detector
+Decodes frames from base64 data URLs, encoded image bodies (JPEG/PNG/WebP),
+multipart uploads and raw pixel buffers described by X-Frame-* headers.
+Binary bodies are wrapped with np.frombuffer, so no extra copy is made before decoding.
+"""
+import base64
+import cv2
+import numpy as np
+from metrics import stage_timer
+
+ENCODED_IMAGE_TYPES = ('image/jpeg', 'image/jpg', 'image/png', 'image/webp')
+RAW_PIXEL_TYPES = ('application/octet-stream', 'application/x-raw-pixels')
+PIXEL_FORMATS = {
+    # format: (channels, conversion to BGR or None)
+    'bgr': (3, None),
+    'rgb': (3, cv2.COLOR_RGB2BGR),
+    'bgra': (4, cv2.COLOR_BGRA2BGR),
+    'rgba': (4, cv2.COLOR_RGBA2BGR),
+    'gray': (1, cv2.COLOR_GRAY2BGR)
+}
+
+class FrameDecodeError(ValueError):
+    """Raised when an uploaded frame cannot be turned into an image"""
+
+def decode_image_bytes(buffer, flags=cv2.IMREAD_COLOR):
+    """Decode an encoded image (JPEG/PNG/...) from bytes or any buffer without copying it first."""
+    nparr = np.frombuffer(buffer, np.uint8)
+    if nparr.size == 0:
+        raise FrameDecodeError("Empty image body")
+
+    with stage_timer('imdecode'):
+        img = cv2.imdecode(nparr, flags)
+    if img is None:
+        raise FrameDecodeError("Could not decode image")
+
+    return img
+
+def decode_data_url(image_data, flags=cv2.IMREAD_COLOR):
+    """Decode a base64 data URL (data:image/jpeg;base64,...) or bare base64 string."""
+    try:
+        with stage_timer('base64_decode'):
+            image_bytes = base64.b64decode(image_data.split(',', 1)[-1])
+    except (ValueError, AttributeError) as e:
+        raise FrameDecodeError(f"Invalid base64 image data: {e}")
+
+    return decode_image_bytes(image_bytes, flags)
+
+def decode_raw_pixels(buffer, width, height, pixel_format='bgr'):
+    """Wrap a raw pixel buffer as a BGR image; BGR input is returned as a zero-copy view."""
+    pixel_format = (pixel_format or 'bgr').lower()
+    if pixel_format not in PIXEL_FORMATS:
+        raise FrameDecodeError(f"Unsupported pixel format: {pixel_format}")
+
+    channels, conversion = PIXEL_FORMATS[pixel_format]
+    try:
+        width, height = int(width), int(height)
+    except (TypeError, ValueError):
+        raise FrameDecodeError("Raw frames need integer X-Frame-Width and X-Frame-Height headers")
+
+    expected = width * height * channels
+    nparr = np.frombuffer(buffer, np.uint8)
+    if width <= 0 or height <= 0 or nparr.size != expected:
+        raise FrameDecodeError(f"Raw frame is {nparr.size} bytes, expected {expected} for {width}x{height} {pixel_format}")
+
+    img = nparr.reshape((height, width, channels)) if channels > 1 else nparr.reshape((height, width))
+    if conversion is not None:
+        with stage_timer('pixel_convert'):
+            img = cv2.cvtColor(img, conversion)
+
+    return img
+
+def _decode_upload(file_storage, flags=cv2.IMREAD_COLOR):
+    """Decode one multipart file part."""
+    return decode_image_bytes(file_storage.read(), flags)
+
+def frame_from_request(req, flags=cv2.IMREAD_COLOR):
+    """
+    Decode the frame carried by a Flask request.
+    Accepts image/* bodies, multipart 'image' uploads, raw pixel bodies and JSON {"image": data_url}.
+    flags apply to encoded images (e.g. a reduced grayscale decode for detectors that allow it).
+    Returns None if the request carries no image.
+    """
+    content_type = (req.mimetype or '').lower()
+
+    if content_type in ENCODED_IMAGE_TYPES:
+        with stage_timer('read_body'):
+            body = req.get_data(cache=False)
+        return decode_image_bytes(body, flags)
+
+    if content_type in RAW_PIXEL_TYPES:
+        with stage_timer('read_body'):
+            body = req.get_data(cache=False)
+        return decode_raw_pixels(
+            body,
+            req.headers.get('X-Frame-Width'),
+            req.headers.get('X-Frame-Height'),
+            req.headers.get('X-Pixel-Format', 'bgr')
+        )
+
+    if content_type == 'multipart/form-data':
+        upload = req.files.get('image')
+        return _decode_upload(upload, flags) if upload else None
+
+    with stage_timer('json_parse'):
+        data = req.get_json(silent=True) or {}
+    image_data = data.get('image')
+    return decode_data_url(image_data, flags) if image_data else None
+
+def frames_from_request(req, flags=cv2.IMREAD_COLOR):
+    """
+    Collect the frames of a batch request.
+    Multipart uploads (repeated 'images' parts) are decoded here; JSON data URLs are
+    returned as-is so the caller can report decode failures per image.
+    """
+    if (req.mimetype or '').lower() == 'multipart/form-data':
+        return [_decode_upload(upload, flags) for upload in req.files.getlist('images')]
+
+    data = req.get_json(silent=True) or {}
+    images = data.get('images')
+    return images if isinstance(images, list) else []
@@ -0,0 +1,43 @@
+# Gunicorn configuration for the emotion music app
+# The app is preloaded in the master so the emotion model weights are shared
+# copy-on-write by every worker instead of being loaded once per worker.
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Seen by config.py: streaming sessions are per process, and each event stream holds a thread
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+
+# Import app.py (and load the model weights) once, before forking workers.
+# In process inference mode each worker owns its own process pool, so preloading is off by default.
+_preload_default = 'false' if os.getenv('INFERENCE_MODE', 'inline') == 'process' else 'true'
+preload_app = os.getenv('GUNICORN_PRELOAD', _preload_default).lower() == 'true'
+
+# Framework thread pools (TensorFlow, onnxruntime) are not fork-safe: a preloading master
+# only loads the weights, and every worker runs the dummy forward pass after the fork
+if preload_app:
+    os.environ.setdefault('WARMUP_DEFER_FORWARD_PASS', 'true')
+
+# Recycled workers are forked from the warm master, so recycling stays cheap;
+# jitter keeps all workers from restarting at the same moment
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '100'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '20'))
+
+
+def post_worker_init(worker):
+    """Finish the model warmup in the worker, before it accepts requests."""
+    from app import WARMUP_SETTINGS, emotion_system
+    if WARMUP_SETTINGS['on_startup']:
+        emotion_system.warmup()
+
+
+def when_ready(server):
+    """Move the preloaded objects out of the GC's reach so workers don't dirty shared pages."""
+    if preload_app:
+        gc.freeze()
+        server.log.info("Preloaded app frozen for copy-on-write sharing")
@@ -0,0 +1,253 @@
+"""
+Pluggable inference executor
+Runs emotion analysis inline on the request thread, on a thread pool, or on a
+pool of worker processes that each load the model once. The number of frames
+in flight is bounded; callers get ExecutorSaturated or InferenceTimeout so the
+web tier can answer 429/503 instead of queueing forever.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from detectors import build_detector
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ('inline', 'thread', 'process')
+
+# Detector owned by each worker process, built once by the pool initializer
+_worker_detector = None
+
+def _init_worker(detector_name, warmup_frame_size):
+    """Process-pool initializer: load the model once per worker."""
+    global _worker_detector
+    _worker_detector = build_detector(detector_name)
+
+    warmup = getattr(_worker_detector, 'warmup', None)
+    if warmup is not None:
+        warmup(warmup_frame_size)
+
+    logger.info(f"Inference worker {os.getpid()} ready ({detector_name})")
+
+def _worker_analyze(img):
+    return _worker_detector.analyze_emotion_from_frame(img)
+
+def _worker_analyze_faces(payload):
+    img, max_faces = payload
+    return _worker_detector.analyze_faces(img, max_faces)
+
+def _worker_analyze_batch(frames):
+    return _worker_detector.analyze_frames(frames)
+
+def _worker_ping():
+    return os.getpid()
+
+class ExecutorSaturated(Exception):
+    """Raised when too many frames are already waiting for inference"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class InferenceTimeout(Exception):
+    """Raised when a frame is not analyzed within the per-request timeout"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    """Runs detector calls with bounded concurrency in the configured mode"""
+
+    def __init__(self, detector, detector_name, mode='inline', workers=2, max_pending=16,
+                 timeout_seconds=30.0, retry_after_seconds=1, start_method='spawn', warmup_frame_size=(480, 640)):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode '{mode}', expected one of {INFERENCE_MODES}")
+
+        self.detector = detector
+        self.detector_name = detector_name
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.timeout_seconds = float(timeout_seconds)
+        self.retry_after_seconds = int(retry_after_seconds)
+        self.start_method = start_method
+        self.warmup_frame_size = warmup_frame_size
+
+        self.completed = 0  # Finished with a usable result
+        self.failed = 0  # Raised, or returned a detector error result
+        self.rejected = 0
+        self.timeouts = 0  # Callers that gave up waiting (the work may still finish, but is not counted as completed)
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def analyze(self, img):
+        """Analyze one frame."""
+        return self._run(self.detector.analyze_emotion_from_frame, _worker_analyze, img)
+
+    def analyze_faces(self, img, max_faces=None):
+        """Analyze every face in one frame (multi-face mode)."""
+        return self._run(self._local_analyze_faces, _worker_analyze_faces, (img, max_faces))
+
+    def analyze_batch(self, frames):
+        """Analyze a list of frames as one unit of work."""
+        return self._run(self.detector.analyze_frames, _worker_analyze_batch, frames)
+
+    def warmup(self, forward_pass=True):
+        """
+        Load the model ahead of traffic: in-process for inline/thread, once per worker for process mode.
+        forward_pass=False only loads the weights in-process (see FaceEmotionDetector.warmup).
+        """
+        if self.mode != 'process':
+            warmup = getattr(self.detector, 'warmup', None)
+            if warmup is not None:
+                warmup(self.warmup_frame_size, forward_pass=forward_pass)
+            return
+
+        # One ping per worker makes the pool spawn (and initialize) every process
+        pool = self._get_pool()
+        futures = [pool.submit(_worker_ping) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"Process pool warmed up: {len(pids)} worker(s)")
+
+    def queue_depth(self):
+        """Frames currently accepted but not finished."""
+        return self._in_flight
+
+    def stats(self):
+        """Return executor counters."""
+        return {
+            'mode': self.mode,
+            'workers': self.workers if self.mode != 'inline' else 1,
+            'in_flight': self._in_flight,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _local_analyze_faces(self, payload):
+        img, max_faces = payload
+        return self.detector.analyze_faces(img, max_faces)
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(
+                    f"Inference queue is full ({self._in_flight} frames pending)",
+                    self.retry_after_seconds
+                )
+            self._in_flight += 1
+
+    def _release(self, outcome):
+        """Free a slot; outcome is 'completed', 'failed' or None (cancelled or timed out, counted elsewhere)."""
+        with self._lock:
+            self._in_flight -= 1
+            if outcome == 'completed':
+                self.completed += 1
+            elif outcome == 'failed':
+                self.failed += 1
+
+    @staticmethod
+    def _outcome(result):
+        """'failed' for detector error results (single or batched), else 'completed'."""
+        results = result if isinstance(result, list) else [result]
+        return 'failed' if any(isinstance(item, dict) and 'error' in item for item in results) else 'completed'
+
+    def _release_future(self, future):
+        """Done callback: the single place a submitted call is counted, unless the caller already timed it out."""
+        if future.cancelled():
+            outcome = None
+        elif future.exception() is not None:
+            outcome = 'failed'
+        else:
+            outcome = self._outcome(future.result())
+
+        # Decided under the lock the timeout path takes, so a call is counted as a timeout or by outcome, never both
+        with self._lock:
+            future.settled = True
+            if future.abandoned:
+                outcome = None
+        self._release(outcome)
+
+    def _get_pool(self):
+        """Create the pool lazily, and again in a forked child (pools don't survive fork)."""
+        pid = os.getpid()
+        if self._pool is not None and self._pool_pid == pid:
+            return self._pool
+
+        with self._lock:
+            if self._pool is None or self._pool_pid != pid:
+                if self.mode == 'thread':
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+                else:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                        initargs=(self.detector_name, self.warmup_frame_size)
+                    )
+                self._pool_pid = pid
+
+        return self._pool
+
+    def _run(self, local_fn, worker_fn, payload):
+        """Admit the work, run it in the configured mode and wait at most timeout_seconds."""
+        self._acquire()
+
+        if self.mode == 'inline':
+            outcome = 'failed'
+            try:
+                result = local_fn(payload)
+                outcome = self._outcome(result)
+                return result
+            finally:
+                self._release(outcome)
+
+        try:
+            pool = self._get_pool()
+            future = pool.submit(local_fn if self.mode == 'thread' else worker_fn, payload)
+        except Exception:
+            self._release('failed')
+            raise
+
+        # The slot is freed when the work really finishes, even if the caller gave up waiting
+        future.abandoned = False
+        future.settled = False
+        future.add_done_callback(self._release_future)
+
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeout:
+            with self._lock:
+                settled = future.settled
+                if not settled:
+                    future.abandoned = True  # Counted as a timeout here; the done callback won't count it again
+                    self.timeouts += 1
+            if settled:
+                # Finished just as the wait gave up and was already counted by outcome: use the result
+                return future.result()
+            future.cancel()
+            raise InferenceTimeout(
+                f"Inference did not finish within {self.timeout_seconds}s",
+                self.retry_after_seconds
+            )
+        except BrokenProcessPool:
+            logger.error("Inference worker died; the process pool will be recreated")
+            with self._lock:
+                self._pool = None
+            raise
@@ -0,0 +1,236 @@
+"""
+Low-overhead metrics with Prometheus text exposition
+Histograms and counters are sharded per thread: each thread only ever writes its
+own shard, so recording a sample takes no lock. Shards are summed when /metrics is
+scraped (a scrape may miss a sample that is being written, which is fine for metrics)
+and folded into a base shard when their thread exits, so short-lived threads don't pile up.
+Gauges are callbacks evaluated at scrape time.
+
+The registry is per process: under several gunicorn workers each scrape is answered by
+one worker with its own numbers (see emotion_process_info), so scrape with workers=1.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+# Seconds; covers sub-millisecond decode steps up to multi-second cold inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _ThreadToken:
+    """Lives in a thread's local storage; collected when the thread exits"""
+    __slots__ = ('__weakref__',)
+
+class _ShardedMetric:
+    """Per-thread shards keyed by label value; only shard creation and thread exit take the lock"""
+
+    def __init__(self, name, help_text, label_name=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self._local = threading.local()
+        self._threads = {}  # id(token) -> {label_value: shard} of each live thread
+        self._base = {}  # label_value -> shard holding the totals of exited threads
+        self._lock = threading.RLock()  # Re-entrant: a thread exit may land while a scrape holds it
+
+    def _shard(self, label_value):
+        shards = getattr(self._local, 'shards', None)
+        if shards is None:
+            shards = self._local.shards = {}
+            token = self._local.token = _ThreadToken()
+            with self._lock:
+                self._threads[id(token)] = shards
+            weakref.finalize(token, self._retire, id(token))
+
+        shard = shards.get(label_value)
+        if shard is None:
+            with self._lock:
+                shard = shards[label_value] = self._new_shard()
+        return shard
+
+    def _retire(self, key):
+        """Fold an exited thread's shards into the base shard."""
+        with self._lock:
+            for label_value, shard in self._threads.pop(key, {}).items():
+                base = self._base.get(label_value)
+                self._base[label_value] = list(shard) if base is None else [a + b for a, b in zip(base, shard)]
+
+    def _merged(self):
+        """Sum shards per label value."""
+        with self._lock:
+            shards = [(label_value, list(shard)) for label_value, shard in self._base.items()]
+            for thread_shards in self._threads.values():
+                shards.extend(thread_shards.items())
+
+        merged = {}
+        for label_value, shard in shards:
+            total = merged.get(label_value)
+            merged[label_value] = list(shard) if total is None else [a + b for a, b in zip(total, shard)]
+        return merged
+
+    def _labels(self, label_value, *extra):
+        labels = [(self.label_name, label_value)] if self.label_name else []
+        return _format_labels(labels + list(extra))
+
+class Histogram(_ShardedMetric):
+    """Cumulative-bucket histogram of observed values (seconds)"""
+
+    def __init__(self, name, help_text, label_name=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_name)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_shard(self):
+        # One slot per bucket, one for +Inf, then sum and count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value, label_value=''):
+        """Record one sample; lock-free after the calling thread's first sample."""
+        shard = self._shard(label_value)
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def time(self, label_value=''):
+        """Context manager that observes the elapsed wall time of its block."""
+        return _Timer(self, label_value)
+
+    def snapshot(self):
+        """{label_value: {'count', 'sum'}} for JSON consumers."""
+        return {
+            label_value: {'count': shard[-1], 'sum': round(shard[-2], 6)}
+            for label_value, shard in self._merged().items()
+        }
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_value, shard in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, shard):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._labels(label_value, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._labels(label_value, ("le", "+Inf"))} {shard[-1]}')
+            lines.append(f'{self.name}_sum{self._labels(label_value)} {_format_value(shard[-2])}')
+            lines.append(f'{self.name}_count{self._labels(label_value)} {shard[-1]}')
+        return lines
+
+class Counter(_ShardedMetric):
+    """Monotonic counter"""
+
+    def _new_shard(self):
+        return [0]
+
+    def inc(self, label_value='', amount=1):
+        self._shard(label_value)[0] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_value, shard in sorted(self._merged().items()):
+            lines.append(f'{self.name}{self._labels(label_value)} {_format_value(shard[0])}')
+        return lines
+
+class Gauge:
+    """
+    Value read from a callback at scrape time; the callback may return a number or {label_value: number}.
+    kind='counter' exposes totals that another component already counts.
+    """
+
+    def __init__(self, name, help_text, fn, label_name=None, kind='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+        self.label_name = label_name
+        self.kind = kind
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, item in sorted(value.items()):
+                lines.append(f'{self.name}{_format_labels([(self.label_name, label_value)])} {_format_value(item)}')
+        else:
+            lines.append(f'{self.name} {_format_value(value)}')
+        return lines
+
+class _Timer:
+    __slots__ = ('histogram', 'label_value', 'start')
+
+    def __init__(self, histogram, label_value):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.label_value)
+        return False
+
+class MetricsRegistry:
+    """Named metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name, help_text, label_name=None, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_name, buckets))
+
+    def counter(self, name, help_text, label_name=None):
+        return self._register(Counter(name, help_text, label_name))
+
+    def gauge(self, name, help_text, fn, label_name=None, kind='gauge'):
+        """Register (or replace) a callback gauge."""
+        gauge = Gauge(name, help_text, fn, label_name, kind)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self):
+        """Prometheus text exposition of every metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing gauge callback must not break the whole scrape
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'emotion_stage_seconds',
+    'Latency of each stage of frame analysis',
+    label_name='stage'
+)
+
+def stage_timer(stage):
+    """Time a block as one analysis stage: `with stage_timer('imdecode'): ...`"""
+    return STAGE_SECONDS.time(stage)
@@ -0,0 +1,123 @@
+"""
+Micro-batching queue for model inference
+Gathers concurrent requests for a few milliseconds and runs them as one batch
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Collects items submitted from many threads and hands them to batch_fn together"""
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name='micro-batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self.batches_run = 0
+        self.items_processed = 0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def submit(self, item):
+        """Queue a single item and return a Future for its result."""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def submit_many(self, items):
+        """Queue several items back to back so one collection window sees them all; returns their Futures."""
+        futures = [Future() for _ in items]
+        self._ensure_worker()
+        for item, future in zip(items, futures):
+            self._queue.put((item, future))
+        return futures
+
+    def run(self, item, timeout=None):
+        """Submit one item and block until its batch has been processed."""
+        return self.submit(item).result(timeout=timeout)
+
+    def run_many(self, items, timeout=None):
+        """Submit several items at once so they share as few batches as possible."""
+        futures = self.submit_many(items)
+        return [future.result(timeout=timeout) for future in futures]
+
+    def stats(self):
+        """Return batching counters."""
+        avg_batch = self.items_processed / self.batches_run if self.batches_run else 0.0
+        return {
+            'batches_run': self.batches_run,
+            'items_processed': self.items_processed,
+            'avg_batch_size': round(avg_batch, 2),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize()
+        }
+
+    def _ensure_worker(self):
+        """Start the worker thread lazily (and again in a forked child process)."""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+
+            if self._worker_pid != pid:
+                # Threads don't survive fork, so drop anything queued in the parent
+                self._queue = queue.Queue()
+
+            self._worker_pid = pid
+            self._worker = threading.Thread(target=self._worker_loop, name=self.name, daemon=True)
+            self._worker.start()
+
+    def _collect_batch(self):
+        """Block for the first item, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _worker_loop(self):
+        """Run batches forever."""
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches_run += 1
+            self.items_processed += len(items)
@@ -0,0 +1,34 @@
+"""
+ONNX weight file resolution
+Which file the ONNX backend loads for a precision and runtime. Kept free of OpenCV and
+the detector classes so the detector registry can check the file exists without
+importing the backend.
+"""
+import importlib.util
+import os
+
+PRECISIONS = ('fp32', 'fp16', 'int8')
+RUNTIMES = ('auto', 'opencv', 'onnxruntime')
+
+def weights_path(model_path, precision):
+    """File holding the weights for a precision: model.onnx, model.fp16.onnx or model.int8.onnx."""
+    if precision == 'fp32':
+        return model_path
+    root, ext = os.path.splitext(model_path)
+    return f'{root}.{precision}{ext or ".onnx"}'
+
+def onnxruntime_installed():
+    return importlib.util.find_spec('onnxruntime') is not None
+
+def resolve_runtime(runtime):
+    """'auto' -> onnxruntime if installed, else opencv."""
+    runtime = runtime.lower()
+    if runtime == 'auto':
+        return 'onnxruntime' if onnxruntime_installed() else 'opencv'
+    return runtime
+
+def model_weights(model_path, precision, runtime):
+    """Weights the detector loads: cv2.dnn runs fp16 as a compute target on the fp32 file, other precisions need their own."""
+    if precision == 'fp16' and resolve_runtime(runtime) == 'opencv':
+        return model_path
+    return weights_path(model_path, precision)
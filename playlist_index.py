@@ -0,0 +1,127 @@
+"""
+Precompiled playlist index
+Built once from config.py: parsed playlist IDs and display names, an alias map
+for every detector emotion label, and alias-method tables so a weighted pick is
+O(1) no matter how many playlists an emotion has
+"""
+import random
+from collections import namedtuple
+from types import MappingProxyType
+from urllib.parse import urlparse
+
+PlaylistEntry = namedtuple('PlaylistEntry', ['url', 'playlist_id', 'name', 'artist', 'type', 'emotion'])
+
+def parse_playlist_id(url):
+    """Spotify ID from an open.spotify.com URL (query string such as ?si= is ignored)."""
+    path = urlparse(url).path.rstrip('/')
+    return path.rsplit('/', 1)[-1] if path else url
+
+class AliasTable:
+    """Vose's alias method: O(n) build, O(1) weighted sampling"""
+
+    __slots__ = ('size', 'prob', 'alias')
+
+    def __init__(self, weights):
+        size = len(weights)
+        total = float(sum(weights))
+        if size == 0 or total <= 0:
+            raise ValueError("Alias table needs at least one positive weight")
+
+        scaled = [w * size / total for w in weights]
+        prob = [0.0] * size
+        alias = list(range(size))
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        for i in small + large:
+            prob[i] = 1.0
+
+        self.size = size
+        self.prob = tuple(prob)
+        self.alias = tuple(alias)
+
+    def sample(self, rng=random):
+        """Draw one index."""
+        column = int(rng.random() * self.size)
+        return column if rng.random() < self.prob[column] else self.alias[column]
+
+class PlaylistIndex:
+    """Immutable emotion -> playlist lookup with weighted, no-repeat selection"""
+
+    def __init__(self, emotion_playlists, aliases=None, weights=None, default_emotion='neutral'):
+        weights = weights or {}
+
+        buckets = {}
+        tables = {}
+        for emotion, urls in emotion_playlists.items():
+            if not urls:
+                continue
+            entries = tuple(self._make_entry(url, emotion) for url in urls)
+            buckets[emotion] = entries
+            tables[emotion] = AliasTable([float(weights.get(url, 1.0)) for url in urls])
+
+        if default_emotion not in buckets:
+            raise ValueError(f"Default emotion '{default_emotion}' has no playlists")
+
+        label_map = {emotion: emotion for emotion in buckets}
+        for label, target in (aliases or {}).items():
+            if target in buckets:
+                label_map.setdefault(label, target)
+
+        self.default_emotion = default_emotion
+        self.buckets = MappingProxyType(buckets)
+        self.tables = MappingProxyType(tables)
+        self.label_map = MappingProxyType(label_map)
+
+    @staticmethod
+    def _make_entry(url, emotion):
+        playlist_id = parse_playlist_id(url)
+        return PlaylistEntry(
+            url=url,
+            playlist_id=playlist_id,
+            name=f'Random song from {playlist_id[:8]}... playlist',
+            artist='Various Artists',
+            type='playlist',
+            emotion=emotion
+        )
+
+    def resolve(self, emotion):
+        """Map any detector label (e.g. 'surprise', 'disgust') to an emotion that has playlists."""
+        return self.label_map.get(str(emotion).lower() if emotion else '', self.default_emotion)
+
+    def choose(self, emotion, cursor=None, rng=random):
+        """
+        Weighted O(1) pick for an emotion.
+        cursor is a per-session dict remembering the last pick per emotion, so the same
+        playlist is never served twice in a row to that session.
+        """
+        emotion = self.resolve(emotion)
+        entries = self.buckets[emotion]
+        index = self.tables[emotion].sample(rng)
+
+        if cursor is not None:
+            last = cursor.get(emotion)
+            if index == last and len(entries) > 1:
+                # Rotate to the next playlist instead of redrawing
+                index = (index + 1) % len(entries)
+            cursor[emotion] = index
+
+        return entries[index]
+
+    def emotions(self):
+        """Emotions that have playlists."""
+        return list(self.buckets)
+
+    def stats(self):
+        """Playlist counts per emotion and the alias map."""
+        return {
+            'playlists': {emotion: len(entries) for emotion, entries in self.buckets.items()},
+            'aliases': {label: target for label, target in self.label_map.items() if label != target}
+        }
@@ -0,0 +1,336 @@
+"""
+Per-session emotion state
+Tracks a smoothed emotion vector per session, skips model inference when the
+scene hasn't changed since the last analysis, and enforces songs_before_recheck.
+Sessions live in lock-striped shards, are evicted after an idle timeout and can be
+mirrored to a Redis-compatible store so several gunicorn workers share them.
+"""
+import cv2
+import json
+import logging
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from emotion_smoothing import EmotionSmoother
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def frame_signature(img, size=(32, 24)):
+    """Tiny grayscale thumbnail used for cheap frame-to-frame comparisons."""
+    small = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+def frame_difference(a, b):
+    """Mean absolute pixel difference (0-255) between two signatures."""
+    return float(cv2.absdiff(a, b).mean())
+
+class EmotionSession:
+    """Emotion and playback state for one client"""
+
+    __slots__ = (
+        'session_id', 'smoother', 'change_threshold', 'current_emotion', 'songs_played',
+        'songs_since_check', 'last_check_time', 'playlist_cursor', 'model_calls', 'skipped_calls',
+        'revision', 'last_seen', '_last_signature', '_last_result', '_previous_frame', 'lock'
+    )
+
+    def __init__(self, session_id, smoothing_alpha=0.5, switch_margin=5.0, change_threshold=8.0):
+        self.session_id = session_id
+        self.smoother = EmotionSmoother(smoothing_alpha, switch_margin)
+        self.change_threshold = float(change_threshold)
+
+        self.current_emotion = None
+        self.songs_played = 0
+        self.songs_since_check = 0
+        self.last_check_time = None
+        self.playlist_cursor = {}  # Last playlist per emotion, so picks never repeat back to back
+
+        self.model_calls = 0
+        self.skipped_calls = 0
+
+        self.revision = 0  # Bumped on every save to the external store
+        self.last_seen = time.monotonic()
+
+        self._last_signature = None
+        self._last_result = None
+        self._previous_frame = None  # (received_at, signature) of the last frame received, analyzed or not
+        self.lock = threading.Lock()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def due_for_recheck(self, songs_before_recheck):
+        """True when there is no emotion yet or enough songs have played since the last check."""
+        return self.current_emotion is None or self.songs_since_check >= songs_before_recheck
+
+    def swap_previous_signature(self, signature, max_age_seconds):
+        """Remember signature as the newest frame; return the previous frame's if it arrived within max_age_seconds."""
+        now = time.monotonic()
+        previous, self._previous_frame = self._previous_frame, (now, signature)
+        if previous is None or now - previous[0] > max_age_seconds:
+            return None
+        return previous[1]
+
+    def needs_inference(self, signature, songs_before_recheck, multi_face=False):
+        """Decide whether a new frame must go through the model or the last result still holds."""
+        if self._last_result is None or self.due_for_recheck(songs_before_recheck):
+            return True
+        if multi_face != ('faces' in self._last_result):
+            return True  # Switching between single- and multi-face mode
+        if self._last_signature is None:
+            return True
+        return frame_difference(signature, self._last_signature) > self.change_threshold
+
+    def record_analysis(self, result, signature):
+        """Blend a fresh detector result into the session and return it with the smoothed emotion."""
+        result = dict(result)
+        result['detected_emotion'] = result.get('dominant_emotion')
+        self.model_calls += 1
+
+        if result.get('success'):
+            self.smoother.update(result.get('emotion_scores'))
+            self.current_emotion = self.smoother.dominant_emotion
+            self.songs_since_check = 0
+            self.last_check_time = datetime.now()
+            self._last_signature = signature
+            self._last_result = result
+
+        if self.current_emotion is not None:
+            # Recommendations follow the smoothed emotion, not a single noisy frame
+            result['dominant_emotion'] = self.current_emotion
+            result['smoothed_scores'] = {k: round(v, 2) for k, v in self.smoother.scores.items()}
+
+        return result
+
+    def reuse_result(self):
+        """Answer from the last analysis without running the model."""
+        self.skipped_calls += 1
+        result = dict(self._last_result)
+        result['dominant_emotion'] = self.current_emotion
+        result['smoothed_scores'] = {k: round(v, 2) for k, v in self.smoother.scores.items()}
+        result['reused'] = True
+        return result
+
+    def has_recent_result(self, max_age_seconds, multi_face=False):
+        """True if a last result in the requested mode is at most max_age_seconds old."""
+        if self._last_result is None or self.last_check_time is None:
+            return False
+        if multi_face != ('faces' in self._last_result):
+            return False
+        return (datetime.now() - self.last_check_time).total_seconds() <= max_age_seconds
+
+    def record_song(self, emotion):
+        """Count a recommended song."""
+        self.songs_played += 1
+        self.songs_since_check += 1
+        if self.current_emotion is None:
+            self.current_emotion = emotion
+
+    def reset(self):
+        """Reset the song counter (emotion history is kept)."""
+        self.songs_played = 0
+        self.songs_since_check = 0
+
+    def to_state(self):
+        """JSON-serializable state for the external store (the last frame and result stay local)."""
+        return {
+            'revision': self.revision,
+            'current_emotion': self.current_emotion,
+            'songs_played': self.songs_played,
+            'songs_since_check': self.songs_since_check,
+            'last_check_time': self.last_check_time.isoformat() if self.last_check_time else None,
+            'playlist_cursor': self.playlist_cursor,
+            'model_calls': self.model_calls,
+            'skipped_calls': self.skipped_calls,
+            'smoother': {
+                'scores': self.smoother.scores,
+                'dominant_emotion': self.smoother.dominant_emotion,
+                'updates': self.smoother.updates
+            }
+        }
+
+    def load_state(self, state):
+        """Adopt state written by another worker."""
+        if state['model_calls'] != self.model_calls:
+            # Another worker analyzed a newer frame; don't answer from our older result
+            self._last_signature = None
+            self._last_result = None
+
+        self.revision = state['revision']
+        self.current_emotion = state['current_emotion']
+        self.songs_played = state['songs_played']
+        self.songs_since_check = state['songs_since_check']
+        last_check_time = state['last_check_time']
+        self.last_check_time = datetime.fromisoformat(last_check_time) if last_check_time else None
+        self.playlist_cursor = dict(state['playlist_cursor'])
+        self.model_calls = state['model_calls']
+        self.skipped_calls = state['skipped_calls']
+
+        smoother = state['smoother']
+        self.smoother.scores = dict(smoother['scores'])
+        self.smoother.dominant_emotion = smoother['dominant_emotion']
+        self.smoother.updates = smoother['updates']
+
+    def stats(self):
+        """Return session counters."""
+        return {
+            'session_id': self.session_id,
+            'current_emotion': self.current_emotion,
+            'songs_played': self.songs_played,
+            'songs_since_check': self.songs_since_check,
+            'model_calls': self.model_calls,
+            'skipped_calls': self.skipped_calls,
+            'last_check_time': self.last_check_time.isoformat() if self.last_check_time else None
+        }
+
+class RedisSessionBackend:
+    """
+    Session state as JSON strings in a Redis-compatible store (GET/SET EX/DEL only),
+    so any worker can pick up a session another worker last served
+    """
+
+    def __init__(self, url, ttl_seconds=3600, prefix='emotion:session:', timeout=0.5):
+        import redis  # Optional dependency, only needed with SESSION_STORE_URL
+
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+
+    def load(self, session_id):
+        payload = self.client.get(self.prefix + session_id)
+        return json.loads(payload) if payload else None
+
+    def save(self, session_id, state):
+        self.client.set(self.prefix + session_id, json.dumps(state, separators=(',', ':')), ex=self.ttl_seconds)
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+class SessionStateEngine:
+    """
+    Looks up (and creates) per-session emotion state
+    Sessions are spread over lock-striped shards so lookups for different clients rarely
+    contend; each session also carries its own lock for its counters.
+    """
+
+    def __init__(self, smoothing_alpha=0.5, switch_margin=5.0, change_threshold=8.0,
+                 shards=16, idle_timeout_seconds=1800, backend=None, pinned=()):
+        self.smoothing_alpha = smoothing_alpha
+        self.switch_margin = switch_margin
+        self.change_threshold = change_threshold
+        self.idle_timeout_seconds = float(idle_timeout_seconds)
+        self.backend = backend
+        self.pinned = frozenset(pinned)  # Never evicted (the default/auto-capture session)
+
+        self._shards = [{} for _ in range(max(1, int(shards)))]
+        self._locks = [threading.Lock() for _ in self._shards]
+
+        # Sweeps run on lookups, at most every quarter of the idle timeout
+        self._sweep_interval = max(1.0, self.idle_timeout_seconds / 4)
+        self._next_sweep = time.monotonic() + self._sweep_interval
+        self._sweep_lock = threading.Lock()
+        self.evictions = 0
+        self.backend_errors = 0
+
+    def _shard(self, session_id):
+        # crc32 rather than hash(): stable across processes and PYTHONHASHSEED
+        return zlib.crc32(session_id.encode('utf-8')) % len(self._shards)
+
+    def get(self, session_id):
+        """Return the session, creating it on first use. Raises ValueError for malformed IDs."""
+        if not SESSION_ID_PATTERN.match(session_id or ''):
+            raise ValueError("Session ID must be 1-64 letters, digits, '-' or '_'")
+
+        index = self._shard(session_id)
+        with self._locks[index]:
+            session = self._shards[index].get(session_id)
+            if session is None:
+                session = EmotionSession(session_id, self.smoothing_alpha, self.switch_margin, self.change_threshold)
+                self._shards[index][session_id] = session
+            session.touch()
+
+        if self.backend is not None:
+            self._refresh(session)
+
+        self._maybe_evict()
+        return session
+
+    def _refresh(self, session):
+        """Pull the stored state if another worker has saved a newer revision."""
+        try:
+            state = self.backend.load(session.session_id)
+        except Exception as e:
+            self._backend_failed('load', e)
+            return
+
+        if state is not None:
+            with session.lock:
+                if state.get('revision', 0) > session.revision:
+                    session.load_state(state)
+
+    def save(self, session):
+        """Persist the session to the external store (no-op without one). Call after mutating it."""
+        if self.backend is None:
+            return
+
+        with session.lock:
+            session.revision += 1
+            state = session.to_state()
+        try:
+            self.backend.save(session.session_id, state)
+        except Exception as e:
+            self._backend_failed('save', e)
+
+    def _backend_failed(self, operation, error):
+        # The local copy keeps serving; a flaky store must not fail requests
+        self.backend_errors += 1
+        logger.warning(f"Session store {operation} failed: {error}")
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self._sweep_interval
+            self.evict_idle(now)
+        finally:
+            self._sweep_lock.release()
+
+    def evict_idle(self, now=None):
+        """Drop sessions unused for idle_timeout_seconds (their stored copy, if any, expires on its own TTL)."""
+        cutoff = (now or time.monotonic()) - self.idle_timeout_seconds
+        evicted = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                idle = [sid for sid, s in shard.items() if s.last_seen < cutoff and sid not in self.pinned]
+                for session_id in idle:
+                    del shard[session_id]
+            evicted += len(idle)
+
+        self.evictions += evicted
+        return evicted
+
+    def _sessions(self):
+        sessions = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                sessions.extend(shard.values())
+        return sessions
+
+    def stats(self):
+        """Aggregate inference savings across sessions."""
+        sessions = self._sessions()
+        return {
+            'sessions': len(sessions),
+            'shards': len(self._shards),
+            'evictions': self.evictions,
+            'backend': type(self.backend).__name__ if self.backend is not None else None,
+            'backend_errors': self.backend_errors,
+            'model_calls': sum(s.model_calls for s in sessions),
+            'skipped_calls': sum(s.skipped_calls for s in sessions)
+        }
@@ -5,16 +5,49 @@ class EmotionMusicApp {
         this.ctx = this.canvas.getContext('2d');
         this.stream = null;
 
+        // Per-browser session: song counters, smoothing and /reset apply to this client only
+        this.sessionId = this.loadSessionId();
+
+        // Live mode: frames are pushed to a streaming session, results arrive as server-sent events
+        this.liveSessionId = null;
+        this.liveSource = null;
+        this.liveTimer = null;
+        this.livePushInFlight = false;
+        this.liveFrameIntervalMs = 500;
+        this.streamingEnabled = true;  // Until /settings says the server can't keep stream sessions together
+
         this.initializeElements();
         this.bindEvents();
         this.loadSettings();
     }
 
+    loadSessionId() {
+        let sessionId = null;
+        try {
+            sessionId = window.localStorage.getItem('emotionSessionId');
+        } catch (error) {
+            // Storage disabled (e.g. private mode): the ID lasts for this page only
+        }
+        if (!sessionId) {
+            sessionId = window.crypto && crypto.randomUUID
+                ? crypto.randomUUID()
+                : `web-${Date.now()}-${Math.floor(Math.random() * 1e6)}`;
+            try {
+                window.localStorage.setItem('emotionSessionId', sessionId);
+            } catch (error) {
+                // Keep the in-memory ID
+            }
+        }
+        return sessionId;
+    }
+
     initializeElements() {
         this.startCameraBtn = document.getElementById('startCamera');
         this.captureBtn = document.getElementById('captureBtn');
         this.autoCaptureBtn = document.getElementById('autoCapture');
         this.stopCameraBtn = document.getElementById('stopCamera');
+        this.liveModeBtn = document.getElementById('liveMode');
+        this.liveModeStatus = document.getElementById('liveModeStatus');
         this.autoCaptureStatus = document.getElementById('autoCaptureStatus');
         this.loading = document.getElementById('loading');
         this.results = document.getElementById('results');
@@ -39,6 +72,7 @@ class EmotionMusicApp {
         this.captureBtn.addEventListener('click', () => this.captureEmotion());
         this.autoCaptureBtn.addEventListener('click', () => this.toggleAutoCapture());
         this.stopCameraBtn.addEventListener('click', () => this.stopCamera());
+        this.liveModeBtn.addEventListener('click', () => this.toggleLiveMode());
         this.updateSettingsBtn.addEventListener('click', () => this.updateSettings());
         this.resetCounterBtn.addEventListener('click', () => this.resetCounter());
     }
@@ -80,6 +114,7 @@ class EmotionMusicApp {
             this.captureBtn.disabled = false;
             this.autoCaptureBtn.disabled = false;
             this.stopCameraBtn.disabled = false;
+            this.liveModeBtn.disabled = !this.streamingEnabled;
 
             console.log('Camera started successfully');
 
@@ -115,6 +150,12 @@ class EmotionMusicApp {
         this.captureBtn.disabled = true;
         this.autoCaptureBtn.disabled = true;
         this.stopCameraBtn.disabled = true;
+        this.liveModeBtn.disabled = true;
+
+        // Stop live mode if running
+        if (this.liveSource) {
+            this.stopLiveMode();
+        }
 
         // Stop auto-capture if running
         if (this.isAutoCaptureRunning) {
@@ -136,16 +177,17 @@ class EmotionMusicApp {
             this.canvas.height = this.video.videoHeight;
             this.ctx.drawImage(this.video, 0, 0);
 
-            // Convert to base64
-            const imageData = this.canvas.toDataURL('image/jpeg', 0.8);
+            // Encode as a JPEG blob (no base64/JSON inflation)
+            const imageBlob = await this.canvasToBlob('image/jpeg', 0.8);
 
             // Send to server for analysis
             const response = await fetch('/analyze', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json',
+                    'Content-Type': 'image/jpeg',
+                    'X-Session-ID': this.sessionId
                 },
-                body: JSON.stringify({ image: imageData })
+                body: imageBlob
             });
 
             const result = await response.json();
@@ -166,6 +208,115 @@ class EmotionMusicApp {
         }
     }
 
+    toggleLiveMode() {
+        if (this.liveSource) {
+            this.stopLiveMode();
+        } else {
+            this.startLiveMode();
+        }
+    }
+
+    startLiveMode() {
+        if (!this.liveSessionId) {
+            this.liveSessionId = window.crypto && crypto.randomUUID
+                ? crypto.randomUUID()
+                : `live-${Date.now()}-${Math.floor(Math.random() * 1e6)}`;
+        }
+
+        // The server only sends an event when the smoothed emotion changes
+        // EventSource can't send headers: the client session goes in the query string
+        this.liveSource = new EventSource(
+            `/stream/${this.liveSessionId}/events?session_id=${encodeURIComponent(this.sessionId)}`
+        );
+        this.liveSource.addEventListener('emotion', (event) => {
+            const update = JSON.parse(event.data);
+            update.emotion_scores = update.smoothed_scores;
+            this.displayResults(update);
+        });
+        this.liveSource.onerror = (error) => console.error('Live mode event stream error:', error);
+
+        this.liveTimer = setInterval(() => this.pushLiveFrame(), this.liveFrameIntervalMs);
+
+        this.liveModeBtn.textContent = 'Stop Live Mode';
+        this.liveModeBtn.className = 'btn btn-danger';
+        this.captureBtn.disabled = true;
+        console.log('Live mode started');
+    }
+
+    disableLiveMode(message) {
+        // Streaming is off on this server (e.g. several gunicorn workers): say so instead of failing silently
+        this.streamingEnabled = false;
+        if (this.liveSource) {
+            this.stopLiveMode();
+        }
+        this.liveModeBtn.disabled = true;
+        this.liveModeBtn.title = message;
+        this.liveModeStatus.textContent = `Live mode unavailable: ${message}`;
+        this.liveModeStatus.style.display = 'block';
+    }
+
+    stopLiveMode() {
+        clearInterval(this.liveTimer);
+        this.liveTimer = null;
+
+        if (this.liveSource) {
+            this.liveSource.close();
+            this.liveSource = null;
+        }
+
+        fetch(`/stream/${this.liveSessionId}`, { method: 'DELETE' })
+            .catch((error) => console.error('Error closing live session:', error));
+
+        this.liveModeBtn.textContent = 'Start Live Mode';
+        this.liveModeBtn.className = 'btn btn-primary';
+        this.captureBtn.disabled = !this.stream;
+        console.log('Live mode stopped');
+    }
+
+    async pushLiveFrame() {
+        // Skip this tick if the previous upload hasn't finished; the server keeps only the newest frame anyway
+        if (this.livePushInFlight || !this.stream) {
+            return;
+        }
+
+        this.livePushInFlight = true;
+        try {
+            this.canvas.width = this.video.videoWidth;
+            this.canvas.height = this.video.videoHeight;
+            this.ctx.drawImage(this.video, 0, 0);
+
+            const frame = await this.canvasToBlob('image/jpeg', 0.7);
+            const response = await fetch(`/stream/${this.liveSessionId}/frame`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'image/jpeg',
+                    'X-Session-ID': this.sessionId
+                },
+                body: frame
+            });
+            if (response.status === 501) {
+                const result = await response.json();
+                this.disableLiveMode(result.error);
+            }
+        } catch (error) {
+            console.error('Error pushing live frame:', error);
+        } finally {
+            this.livePushInFlight = false;
+        }
+    }
+
+    canvasToBlob(type, quality) {
+        return new Promise((resolve, reject) => {
+            this.canvas.toBlob((blob) => {
+                if (blob) {
+                    resolve(blob);
+                } else {
+                    reject(new Error('Could not encode camera frame'));
+                }
+            }, type, quality);
+        });
+    }
+
     displayResults(result) {
         // Display dominant emotion
         this.emotionResult.textContent = result.dominant_emotion;
@@ -237,7 +388,11 @@ class EmotionMusicApp {
 
     async loadSettings() {
         try {
-            const response = await fetch('/settings');
+            const response = await fetch('/settings', {
+                headers: {
+                    'X-Session-ID': this.sessionId
+                }
+            });
             const settings = await response.json();
 
             this.songsBeforeRecheck.value = settings.songs_before_recheck || 3;
@@ -246,6 +401,10 @@ class EmotionMusicApp {
             if (settings.current_emotion) {
                 console.log('Current emotion:', settings.current_emotion);
             }
+
+            if (settings.streaming_enabled === false) {
+                this.disableLiveMode(settings.streaming_message);
+            }
         } catch (error) {
             console.error('Error loading settings:', error);
         }
@@ -264,6 +423,7 @@ class EmotionMusicApp {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'X-Session-ID': this.sessionId
                 },
                 body: JSON.stringify({
                     songs_before_recheck: songsBeforeRecheck
@@ -290,6 +450,7 @@ class EmotionMusicApp {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'X-Session-ID': this.sessionId
                 }
             });
 
@@ -0,0 +1,274 @@
+"""
+Streaming emotion sessions
+Clients push frames continuously to a session and listen for Server-Sent Events.
+Each session analyzes only the newest frame (stale frames are dropped when
+inference falls behind) and emits an event only when the smoothed dominant
+emotion changes. Frames are analyzed and recommendations counted against the
+client's own session (client_id) when the client names one.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from emotion_smoothing import EmotionSmoother
+from session_state import SESSION_ID_PATTERN
+
+logger = logging.getLogger(__name__)
+
+class StreamLimitReached(Exception):
+    """Raised when no more streaming sessions can be opened"""
+
+class StreamSession:
+    """One client's frame stream with latest-frame-wins analysis"""
+
+    def __init__(self, session_id, analyze_fn, on_change=None, smoothing_alpha=0.3, switch_margin=5.0, max_events=32,
+                 client_id=None):
+        self.session_id = session_id
+        self.client_id = client_id  # Client session the stream's analyses and songs belong to
+        self.analyze_fn = analyze_fn
+        self.on_change = on_change
+        self.smoother = EmotionSmoother(smoothing_alpha, switch_margin)
+
+        self.frames_received = 0
+        self.frames_analyzed = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+        self.last_activity = time.monotonic()
+        self.closed = False
+
+        self._latest = None
+        self._events = deque(maxlen=max_events)
+        self._event_seq = 0
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._worker_loop, name=f'stream-{session_id}', daemon=True)
+        self._worker.start()
+
+    @property
+    def owner_id(self):
+        """Session ID that analyses and recommendations are recorded under."""
+        return self.client_id or self.session_id
+
+    def push_frame(self, img):
+        """Replace the pending frame with a newer one; the older frame is dropped unanalyzed."""
+        with self._cond:
+            if self._latest is not None:
+                self.frames_dropped += 1
+            self._latest = img
+            self.frames_received += 1
+            self.last_activity = time.monotonic()
+            self._cond.notify_all()
+
+    def close(self):
+        """Stop the worker and end any open event streams."""
+        with self._cond:
+            self.closed = True
+            self._latest = None
+            self._cond.notify_all()
+
+    def events(self, last_event_id=None, heartbeat_seconds=15.0):
+        """Yield SSE messages: emotion changes as they happen, plus keep-alive comments."""
+        with self._cond:
+            # New listeners start from the current state; reconnecting ones resume after Last-Event-ID
+            last_seen = self._event_seq - 1 if last_event_id is None else last_event_id
+
+        while not self.closed:
+            with self._cond:
+                pending = [event for event in self._events if event[0] > last_seen]
+                if not pending and not self.closed:
+                    self._cond.wait(timeout=heartbeat_seconds)
+                    pending = [event for event in self._events if event[0] > last_seen]
+                self.last_activity = time.monotonic()
+
+            if self.closed:
+                break
+
+            if not pending:
+                yield ': keep-alive\n\n'
+                continue
+
+            for seq, payload in pending:
+                last_seen = seq
+                yield f"id: {seq}\nevent: emotion\ndata: {json.dumps(payload)}\n\n"
+
+    def stats(self):
+        """Return session counters."""
+        return {
+            'session_id': self.session_id,
+            'client_id': self.client_id,
+            'frames_received': self.frames_received,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_dropped': self.frames_dropped,
+            'frames_skipped': self.frames_skipped,
+            'events_emitted': self._event_seq,
+            'dominant_emotion': self.smoother.dominant_emotion,
+            'idle_seconds': round(time.monotonic() - self.last_activity, 1)
+        }
+
+    def _publish(self, payload):
+        with self._cond:
+            self._event_seq += 1
+            self._events.append((self._event_seq, payload))
+            self._cond.notify_all()
+
+    def _next_frame(self):
+        """Block until a frame is pending (or the session closes) and take it."""
+        with self._cond:
+            while self._latest is None and not self.closed:
+                self._cond.wait()
+            img, self._latest = self._latest, None
+            return img
+
+    def _worker_loop(self):
+        while True:
+            img = self._next_frame()
+            if img is None:
+                return
+
+            try:
+                result = self.analyze_fn(img, self.owner_id)
+            except Exception as e:
+                # Overloaded or failed: this frame is simply dropped, the next one will be tried
+                self.frames_dropped += 1
+                logger.warning(f"Stream {self.session_id} dropped a frame: {e}")
+                continue
+
+            if result.get('tier') == 'skipped':
+                # Failed the frame quality gate: nothing new to smooth
+                self.frames_skipped += 1
+                continue
+
+            self.frames_analyzed += 1
+            if not result.get('success'):
+                continue
+
+            if self.smoother.update(result.get('emotion_scores')):
+                payload = self.smoother.snapshot()
+                payload['detector'] = result.get('detector')
+                payload['frames_analyzed'] = self.frames_analyzed
+                payload['frames_dropped'] = self.frames_dropped
+
+                if self.on_change is not None:
+                    try:
+                        payload.update(self.on_change(self.owner_id, self.smoother.dominant_emotion))
+                    except Exception as e:
+                        logger.error(f"Stream {self.session_id} change handler failed: {e}")
+
+                self._publish(payload)
+
+class ListenerStream:
+    """
+    Event iterator that gives back its listener slot when the response is closed
+    (WSGI servers call close() on disconnect, even if iteration never started)
+    """
+
+    def __init__(self, events, release):
+        self._events = events
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            self._events.close()
+            release()
+
+class StreamManager:
+    """Creates, looks up and evicts streaming sessions"""
+
+    def __init__(self, analyze_fn, on_change=None, smoothing_alpha=0.3, switch_margin=5.0,
+                 idle_timeout_seconds=60.0, max_sessions=100, max_listeners=2):
+        self.analyze_fn = analyze_fn
+        self.on_change = on_change
+        self.smoothing_alpha = smoothing_alpha
+        self.switch_margin = switch_margin
+        self.idle_timeout_seconds = float(idle_timeout_seconds)
+        self.max_sessions = int(max_sessions)
+        self.max_listeners = max(1, int(max_listeners))
+        self.listeners = 0
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id, create=True, client_id=None):
+        """
+        Return the session, creating it if allowed; client_id (if given) ties it to the client's
+        own session. Raises ValueError for malformed IDs.
+        """
+        if not SESSION_ID_PATTERN.match(session_id or ''):
+            raise ValueError("Session ID must be 1-64 letters, digits, '-' or '_'")
+
+        self.evict_idle()
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None and create:
+                if len(self._sessions) >= self.max_sessions:
+                    raise StreamLimitReached(f"Too many streaming sessions (max {self.max_sessions})")
+
+                session = StreamSession(
+                    session_id,
+                    self.analyze_fn,
+                    on_change=self.on_change,
+                    smoothing_alpha=self.smoothing_alpha,
+                    switch_margin=self.switch_margin,
+                    client_id=client_id
+                )
+                self._sessions[session_id] = session
+                logger.info(f"Stream session {session_id} opened")
+            elif session is not None and client_id:
+                session.client_id = client_id
+
+            return session
+
+    def listen(self, session, last_event_id=None, heartbeat_seconds=15.0):
+        """
+        Event stream for a session, holding one of max_listeners slots until the client disconnects.
+        Raises StreamLimitReached when every slot is taken, so open streams never starve other requests.
+        """
+        with self._lock:
+            if self.listeners >= self.max_listeners:
+                raise StreamLimitReached(f"Too many open event streams (max {self.max_listeners})")
+            self.listeners += 1
+
+        return ListenerStream(session.events(last_event_id, heartbeat_seconds), self._release_listener)
+
+    def _release_listener(self):
+        with self._lock:
+            self.listeners -= 1
+
+    def close(self, session_id):
+        """Close and forget a session. Returns True if it existed."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session is not None
+
+    def evict_idle(self):
+        """Close sessions that have neither received frames nor had a listener for idle_timeout_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if now - s.last_activity > self.idle_timeout_seconds]
+            sessions = [self._sessions.pop(sid) for sid in idle]
+
+        for session in sessions:
+            session.close()
+            logger.info(f"Stream session {session.session_id} evicted after idling")
+
+    def stats(self):
+        """Return counters for all open sessions."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'active_sessions': len(sessions),
+            'max_sessions': self.max_sessions,
+            'listeners': self.listeners,
+            'max_listeners': self.max_listeners,
+            'sessions': [session.stats() for session in sessions]
+        }
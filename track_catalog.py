@@ -0,0 +1,311 @@
+"""
+Spotify track catalog
+Bulk-fetches the tracks of every configured playlist (with pagination, over a
+pooled HTTP session), persists them in a local SQLite cache and keeps them in
+memory, so picking a random track never touches the network on the request path.
+A background thread refreshes playlists whose cache entry is older than the TTL.
+Connections and the refresher are per process (nothing crosses a gunicorn fork), and
+only the process holding the refresh lease in the cache file calls Spotify; the
+others pick the new tracks up from the cache.
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    track_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    track_id TEXT,
+    name TEXT,
+    artist TEXT,
+    url TEXT,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE TABLE IF NOT EXISTS refresh_lease (
+    name TEXT PRIMARY KEY,
+    owner_pid INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+def create_spotify_client(spotify_config, pool_size=10, timeout=10, retries=3):
+    """Build a spotipy client on a pooled requests session; points at a local fake server when api_base is set."""
+    import requests
+    import spotipy
+    from requests.adapters import HTTPAdapter
+    from spotipy.oauth2 import SpotifyClientCredentials
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if spotify_config.get('access_token'):
+        # Pre-issued token (also what the local fake server expects)
+        client = spotipy.Spotify(auth=spotify_config['access_token'], requests_session=session, requests_timeout=timeout)
+    else:
+        credentials = SpotifyClientCredentials(
+            client_id=spotify_config['client_id'],
+            client_secret=spotify_config['client_secret'],
+            requests_session=session
+        )
+        client = spotipy.Spotify(client_credentials_manager=credentials, requests_session=session, requests_timeout=timeout)
+
+    if spotify_config.get('api_base'):
+        client.prefix = spotify_config['api_base'].rstrip('/') + '/'
+
+    return client
+
+class TrackCatalog:
+    """In-memory playlist -> tracks map backed by a SQLite cache"""
+
+    def __init__(self, client, cache_path, ttl_seconds=86400, refresh_interval_seconds=3600,
+                 page_size=100, max_tracks_per_playlist=2000, reload_interval_seconds=60):
+        self.client = client
+        self.cache_path = cache_path
+        self.ttl_seconds = float(ttl_seconds)
+        self.refresh_interval_seconds = float(refresh_interval_seconds)
+        # Processes without the lease re-read the cache this often
+        self.reload_interval_seconds = min(float(reload_interval_seconds), self.refresh_interval_seconds)
+        self.lease_seconds = 2 * self.refresh_interval_seconds
+        self.page_size = int(page_size)
+        self.max_tracks_per_playlist = int(max_tracks_per_playlist)
+
+        self.playlist_ids = ()
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.reloads = 0
+        self.lease_held = False
+
+        self._tracks = {}  # playlist_id -> tuple of track dicts (replaced whole, never mutated)
+        self._fetched_at = {}
+        self._refresher = None
+        self._refresher_pid = None
+        self._stop = threading.Event()
+
+        # Opened lazily per process: SQLite connections and held locks must not cross fork()
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+        cache_dir = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        with closing(self._open()) as db:
+            db.executescript(SCHEMA)
+
+    def _open(self):
+        # Autocommit; transactions are explicit BEGIN IMMEDIATE so writers queue on the file lock
+        return sqlite3.connect(self.cache_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+
+    def _after_fork(self):
+        """Forked child: forget the parent's connection, lock and refresher thread."""
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        self._refresher = None
+        self.lease_held = False
+
+    @contextmanager
+    def _transaction(self):
+        """This process's connection inside a BEGIN IMMEDIATE transaction."""
+        with self._db_lock:
+            if self._db is None or self._db_pid != os.getpid():
+                self._db = self._open()
+                self._db_pid = os.getpid()
+
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def load(self, playlist_ids):
+        """
+        Load cached tracks for the playlists into memory. Anything missing or stale is fetched by the
+        background refresher, which starts with the first lookup (in the worker, after any fork).
+        """
+        self.playlist_ids = tuple(dict.fromkeys(playlist_ids))
+
+        # Short-lived connection, so a preloading master holds none when it forks
+        with closing(self._open()) as db:
+            self._read_cached(db, self.playlist_ids)
+
+        logger.info(f"Track catalog loaded {sum(len(t) for t in self._tracks.values())} cached tracks "
+                    f"for {len(self._tracks)}/{len(self.playlist_ids)} playlists")
+
+    def _read_cached(self, db, playlist_ids):
+        """Swap in cached playlists that are newer than the in-memory copy; returns how many changed."""
+        changed = 0
+        for playlist_id in playlist_ids:
+            row = db.execute('SELECT fetched_at FROM playlists WHERE playlist_id = ?', (playlist_id,)).fetchone()
+            if row is None or row[0] <= self._fetched_at.get(playlist_id, 0.0):
+                continue
+
+            rows = db.execute(
+                'SELECT track_id, name, artist, url FROM tracks WHERE playlist_id = ? ORDER BY position',
+                (playlist_id,)
+            ).fetchall()
+            self._tracks[playlist_id] = tuple(
+                {'id': track_id, 'name': name, 'artist': artist, 'url': url}
+                for track_id, name, artist, url in rows
+            )
+            self._fetched_at[playlist_id] = row[0]
+            changed += 1
+        return changed
+
+    def reload_cached(self):
+        """Pick up playlists another process refreshed."""
+        with self._transaction() as db:
+            changed = self._read_cached(db, self.playlist_ids)
+        if changed:
+            self.reloads += 1
+            logger.info(f"Track catalog reloaded {changed} playlists refreshed by another process")
+        return changed
+
+    def acquire_lease(self):
+        """Take or renew the refresh lease; True if this process may call Spotify."""
+        now = time.time()
+        pid = os.getpid()
+        try:
+            with self._transaction() as db:
+                row = db.execute('SELECT owner_pid, expires_at FROM refresh_lease WHERE name = ?', ('refresh',)).fetchone()
+                held = row is None or row[0] == pid or row[1] < now
+                if held:
+                    db.execute(
+                        'INSERT OR REPLACE INTO refresh_lease (name, owner_pid, expires_at) VALUES (?, ?, ?)',
+                        ('refresh', pid, now + self.lease_seconds)
+                    )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Track catalog lease check failed: {e}")
+            held = False
+
+        if held and not self.lease_held:
+            logger.info(f"Track catalog refresh lease taken by process {pid}")
+        self.lease_held = held
+        return held
+
+    def random_track(self, playlist_id, rng=random):
+        """Random track from memory, or None if the playlist hasn't been fetched yet."""
+        self.ensure_refresher()
+        tracks = self._tracks.get(playlist_id)
+        if not tracks:
+            return None
+        return tracks[int(rng.random() * len(tracks))]
+
+    def refresh_playlist(self, playlist_id):
+        """Fetch every track of a playlist and swap it into memory and the SQLite cache."""
+        tracks = self._fetch_tracks(playlist_id)
+        fetched_at = time.time()
+
+        with self._transaction() as db:
+            db.execute('DELETE FROM tracks WHERE playlist_id = ?', (playlist_id,))
+            db.executemany(
+                'INSERT INTO tracks (playlist_id, position, track_id, name, artist, url) VALUES (?, ?, ?, ?, ?, ?)',
+                [(playlist_id, i, t['id'], t['name'], t['artist'], t['url']) for i, t in enumerate(tracks)]
+            )
+            db.execute(
+                'INSERT OR REPLACE INTO playlists (playlist_id, fetched_at, track_count) VALUES (?, ?, ?)',
+                (playlist_id, fetched_at, len(tracks))
+            )
+
+        self._tracks[playlist_id] = tuple(tracks)
+        self._fetched_at[playlist_id] = fetched_at
+        self.fetches += 1
+        return len(tracks)
+
+    def refresh_stale(self):
+        """Refresh every playlist that is missing or older than the TTL."""
+        now = time.time()
+        for playlist_id in self.playlist_ids:
+            if now - self._fetched_at.get(playlist_id, 0.0) < self.ttl_seconds:
+                continue
+            try:
+                count = self.refresh_playlist(playlist_id)
+                logger.info(f"Track catalog refreshed {playlist_id}: {count} tracks")
+            except Exception as e:
+                self.fetch_errors += 1
+                logger.error(f"Track catalog could not refresh {playlist_id}: {e}")
+
+    def ensure_refresher(self):
+        """Start the background refresh thread lazily (again in a forked child process)."""
+        pid = os.getpid()
+        if self._refresher is not None and self._refresher_pid == pid:
+            return
+
+        with self._db_lock:
+            if self._refresher is not None and self._refresher_pid == pid:
+                return
+            self._refresher_pid = pid
+            self._refresher = threading.Thread(target=self._refresh_loop, name='track-catalog-refresh', daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Return catalog counters."""
+        return {
+            'playlists_loaded': len(self._tracks),
+            'playlists_configured': len(self.playlist_ids),
+            'tracks': sum(len(tracks) for tracks in self._tracks.values()),
+            'fetches': self.fetches,
+            'fetch_errors': self.fetch_errors,
+            'reloads': self.reloads,
+            'refresh_lease_held': self.lease_held,
+            'cache_path': self.cache_path
+        }
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.acquire_lease():
+                    self.refresh_stale()
+                else:
+                    self.reload_cached()
+            except Exception as e:
+                logger.error(f"Track catalog refresh failed: {e}")
+            self._stop.wait(self.refresh_interval_seconds if self.lease_held else self.reload_interval_seconds)
+
+    def _fetch_tracks(self, playlist_id):
+        """Page through a playlist's items."""
+        tracks = []
+        page = self.client.playlist_items(
+            playlist_id,
+            fields='items(track(id,name,artists(name),external_urls)),next',
+            limit=self.page_size,
+            additional_types=('track',)
+        )
+
+        while page:
+            for item in page.get('items', []):
+                track = item.get('track') or {}
+                url = (track.get('external_urls') or {}).get('spotify')
+                if not track.get('id') or not url:
+                    continue  # Local files and removed tracks can't be opened
+                tracks.append({
+                    'id': track['id'],
+                    'name': track.get('name') or 'Unknown Track',
+                    'artist': ', '.join(a.get('name', '') for a in track.get('artists') or []) or 'Unknown Artist',
+                    'url': url
+                })
+
+            if len(tracks) >= self.max_tracks_per_playlist or not page.get('next'):
+                break
+            page = self.client.next(page)
+
+        return tracks[:self.max_tracks_per_playlist]
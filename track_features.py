@@ -0,0 +1,328 @@
+"""
+Nearest-neighbour track recommender over a precomputed feature matrix
+The full emotion score vector is mapped to a (valence, energy) target, and the closest
+tracks are found with vectorized dot products over a float32 matrix stored as .npy files.
+The files are memory-mapped, so catalogs of millions of tracks open instantly and the
+pages are shared by every worker process. Large catalogs can add an inverted-file (IVF)
+index: tracks are bucketed by k-means centroid and a query scans only the nearest buckets.
+
+    python track_features.py build --csv tracks.csv --out /data/track_features --ivf-lists 1024
+    python track_features.py synthetic --tracks 1000000 --out /tmp/track_features --ivf-lists 1024
+    TRACK_FEATURES_PATH=/tmp/track_features python app.py
+
+CSV input needs id, valence and energy columns (0-1, as in Spotify's audio features);
+name and artist are optional.
+"""
+import argparse
+import csv
+import logging
+import os
+import random
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ('valence', 'energy')
+
+# Where each detector emotion sits in valence/energy space (circumplex model of affect)
+EMOTION_COORDINATES = {
+    'happy': (0.85, 0.70),
+    'surprise': (0.70, 0.85),
+    'neutral': (0.50, 0.45),
+    'sad': (0.15, 0.25),
+    'fear': (0.20, 0.70),
+    'angry': (0.15, 0.90),
+    'disgust': (0.20, 0.55)
+}
+
+FILES = {
+    'features': 'features.npy',      # (N, 2) float32
+    'sq_norms': 'sq_norms.npy',      # (N,) float32, squared row norms for dot-product distances
+    'track_ids': 'track_ids.npy',    # (N,) bytes
+    'names': 'names.npy',            # optional (N,) UTF-8 bytes
+    'artists': 'artists.npy',        # optional (N,) UTF-8 bytes
+    'ivf_centroids': 'ivf_centroids.npy',  # optional (L, 2) float32
+    'ivf_order': 'ivf_order.npy',    # optional (N,) int64, track indices grouped by list
+    'ivf_offsets': 'ivf_offsets.npy'  # optional (L + 1,) int64, list boundaries in ivf_order
+}
+
+def emotion_to_features(emotion_scores):
+    """Score dict (any scale) -> (valence, energy) target: the score-weighted mean of emotion coordinates."""
+    return emotions_to_features([emotion_scores])[0]
+
+def emotions_to_features(score_dicts):
+    """Batch version of emotion_to_features: (B, 2) float32."""
+    labels = list(EMOTION_COORDINATES)
+    coordinates = np.array([EMOTION_COORDINATES[label] for label in labels], dtype=np.float32)
+
+    weights = np.array([
+        [max(0.0, float(scores.get(label, 0.0))) for label in labels] for scores in score_dicts
+    ], dtype=np.float32).reshape(len(score_dicts), len(labels))
+    totals = weights.sum(axis=1, keepdims=True)
+    # No usable scores: aim for the neutral point
+    weights[totals[:, 0] == 0, labels.index('neutral')] = 1.0
+    weights /= weights.sum(axis=1, keepdims=True)
+    return weights @ coordinates
+
+class TrackFeatureIndex:
+    """Top-k nearest tracks to (valence, energy) targets over a memory-mapped feature matrix"""
+
+    def __init__(self, directory, nprobe=8, approximate_min_tracks=100000, chunk_rows=262144):
+        self.directory = directory
+        self.nprobe = max(1, int(nprobe))
+        self.chunk_rows = max(1024, int(chunk_rows))
+
+        self.features = self._load('features')
+        self.sq_norms = self._load('sq_norms')
+        self.track_ids = self._load('track_ids')
+        self.names = self._load('names', required=False)
+        self.artists = self._load('artists', required=False)
+
+        self.ivf_centroids = self._load('ivf_centroids', required=False)
+        self.ivf_order = self._load('ivf_order', required=False)
+        self.ivf_offsets = self._load('ivf_offsets', required=False)
+        if self.ivf_centroids is not None:
+            # Centroids are tiny; keep them in memory
+            self.ivf_centroids = np.asarray(self.ivf_centroids, dtype=np.float32)
+            self.ivf_offsets = np.asarray(self.ivf_offsets)
+
+        self.size = len(self.features)
+        self.approximate = self.ivf_centroids is not None and self.size >= approximate_min_tracks
+
+        self.queries = 0
+        self.tracks_scanned = 0
+        self._lock = threading.Lock()
+
+    def _load(self, name, required=True):
+        path = os.path.join(self.directory, FILES[name])
+        if not os.path.exists(path):
+            if required:
+                raise FileNotFoundError(f"Track feature file missing: {path}")
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def query(self, targets, k=10):
+        """Indices and squared distances (B, k) of the k nearest tracks to each target row, nearest first."""
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float32))
+        k = max(1, min(int(k), self.size))
+
+        if self.approximate:
+            indices, distances, scanned = self._query_ivf(targets, k)
+        else:
+            indices, distances = self._query_exact(targets, k)
+            scanned = self.size * len(targets)
+
+        with self._lock:
+            self.queries += len(targets)
+            self.tracks_scanned += scanned
+        return indices, distances
+
+    def _query_exact(self, targets, k):
+        """Brute force in row chunks: |x - q|^2 = |x|^2 - 2 x.q + |q|^2, keeping a running top-k."""
+        count = len(targets)
+        best_d = np.full((count, k), np.inf, dtype=np.float32)
+        best_i = np.zeros((count, k), dtype=np.int64)
+
+        for start in range(0, self.size, self.chunk_rows):
+            end = min(start + self.chunk_rows, self.size)
+            distances = self.sq_norms[start:end][None, :] - 2.0 * (targets @ self.features[start:end].T)
+            keep = min(k, end - start)
+            part = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+
+            merged_d = np.concatenate([best_d, np.take_along_axis(distances, part, axis=1)], axis=1)
+            merged_i = np.concatenate([best_i, part + start], axis=1)
+            top = np.argpartition(merged_d, k - 1, axis=1)[:, :k]
+            best_d = np.take_along_axis(merged_d, top, axis=1)
+            best_i = np.take_along_axis(merged_i, top, axis=1)
+
+        return self._finish(best_i, best_d, targets)
+
+    def _query_ivf(self, targets, k):
+        """Scan only the nprobe lists whose centroids are nearest each target, then rank exactly."""
+        centroid_d = (self.ivf_centroids ** 2).sum(axis=1)[None, :] - 2.0 * (targets @ self.ivf_centroids.T)
+        nprobe = min(self.nprobe, len(self.ivf_centroids))
+        probes = np.argpartition(centroid_d, nprobe - 1, axis=1)[:, :nprobe]
+
+        indices = np.zeros((len(targets), k), dtype=np.int64)
+        distances = np.zeros((len(targets), k), dtype=np.float32)
+        scanned = 0
+        for row, lists in enumerate(probes):
+            # Sorted candidates read the memory-mapped rows in file order
+            candidates = np.sort(np.concatenate([
+                self.ivf_order[self.ivf_offsets[l]:self.ivf_offsets[l + 1]] for l in lists
+            ]))
+            scanned += len(candidates)
+            if len(candidates) < k:
+                exact_i, exact_d = self._query_exact(targets[row:row + 1], k)
+                indices[row], distances[row] = exact_i[0], exact_d[0]
+                scanned += self.size
+                continue
+
+            d = self.sq_norms[candidates] - 2.0 * (self.features[candidates] @ targets[row])
+            top = np.argpartition(d, k - 1)[:k]
+            order = np.argsort(d[top])
+            indices[row] = candidates[top[order]]
+            distances[row] = d[top[order]] + targets[row] @ targets[row]
+
+        return indices, distances, scanned
+
+    @staticmethod
+    def _finish(indices, distances, targets):
+        order = np.argsort(distances, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1) + (targets * targets).sum(axis=1, keepdims=True)
+        return indices, distances
+
+    def track(self, index, distance=None):
+        """Track record for a row of the matrix."""
+        track_id = self.track_ids[index].decode('utf-8')
+        valence, energy = (float(v) for v in self.features[index])
+        track = {
+            'id': track_id,
+            'url': f'https://open.spotify.com/track/{track_id}',
+            'name': self.names[index].decode('utf-8') if self.names is not None else f'Track {track_id[:8]}',
+            'artist': self.artists[index].decode('utf-8') if self.artists is not None else 'Unknown Artist',
+            'valence': round(valence, 3),
+            'energy': round(energy, 3)
+        }
+        if distance is not None:
+            track['distance'] = round(float(max(distance, 0.0)) ** 0.5, 4)
+        return track
+
+    def nearest_tracks(self, score_dicts, k=10):
+        """Batched API: top-k track records for each emotion score dict."""
+        targets = emotions_to_features(score_dicts)
+        indices, distances = self.query(targets, k)
+        return [
+            [self.track(i, d) for i, d in zip(row_i, row_d)]
+            for row_i, row_d in zip(indices, distances)
+        ]
+
+    def recommend(self, emotion_scores, k=25, rng=random):
+        """One track drawn from the k nearest, so repeated queries for a mood don't always return the same song."""
+        target = emotion_to_features(emotion_scores)
+        indices, distances = self.query(target, k)
+        pick = rng.randrange(indices.shape[1])
+        track = self.track(indices[0, pick], distances[0, pick])
+        track['target'] = {name: round(float(value), 3) for name, value in zip(FEATURES, target)}
+        return track
+
+    def stats(self):
+        """Return index size and query counters."""
+        return {
+            'tracks': self.size,
+            'approximate': self.approximate,
+            'ivf_lists': len(self.ivf_centroids) if self.ivf_centroids is not None else 0,
+            'nprobe': self.nprobe,
+            'queries': self.queries,
+            'avg_tracks_scanned': round(self.tracks_scanned / self.queries, 1) if self.queries else 0.0
+        }
+
+def _kmeans(sample, lists, iterations=15, seed=0):
+    """Lloyd's k-means on a sample of rows; returns (lists, D) float32 centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroid(sample, centroids)
+        counts = np.bincount(assignment, minlength=lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Empty lists restart from random rows
+        centroids[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+    return centroids
+
+def _nearest_centroid(rows, centroids):
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * (rows @ centroids.T)
+    return distances.argmin(axis=1)
+
+def build_index(directory, track_ids, features, names=None, artists=None, ivf_lists=0, seed=0, chunk_rows=262144):
+    """Write the .npy files for a catalog (features: (N, 2) valence/energy in 0-1)."""
+    os.makedirs(directory, exist_ok=True)
+    features = np.asarray(features, dtype=np.float32)
+    count = len(features)
+
+    def path(name):
+        return os.path.join(directory, FILES[name])
+
+    np.save(path('features'), features)
+    np.save(path('sq_norms'), (features * features).sum(axis=1))
+    np.save(path('track_ids'), np.array(track_ids, dtype=np.bytes_))
+    for name, values in (('names', names), ('artists', artists)):
+        if values is not None:
+            np.save(path(name), np.array([v.encode('utf-8') for v in values], dtype=np.bytes_))
+        elif os.path.exists(path(name)):
+            os.remove(path(name))
+
+    if ivf_lists:
+        ivf_lists = min(int(ivf_lists), count)
+        rng = np.random.default_rng(seed)
+        sample = features[rng.choice(count, size=min(count, 64 * ivf_lists), replace=False)]
+        centroids = _kmeans(sample, ivf_lists, seed=seed)
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, chunk_rows):
+            assignment[start:start + chunk_rows] = _nearest_centroid(features[start:start + chunk_rows], centroids)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=ivf_lists))])
+
+        np.save(path('ivf_centroids'), centroids)
+        np.save(path('ivf_order'), order)
+        np.save(path('ivf_offsets'), offsets)
+    else:
+        for name in ('ivf_centroids', 'ivf_order', 'ivf_offsets'):
+            if os.path.exists(path(name)):
+                os.remove(path(name))
+
+    logger.info(f"Track feature index written to {directory}: {count} tracks, {ivf_lists} IVF lists")
+    return directory
+
+def load_csv(csv_path):
+    """Read id, valence, energy (and optional name, artist) columns."""
+    track_ids, features, names, artists = [], [], [], []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        has_names = 'name' in reader.fieldnames
+        has_artists = 'artist' in reader.fieldnames or 'artists' in reader.fieldnames
+        for row in reader:
+            track_ids.append(row.get('id') or row['track_id'])
+            features.append((float(row['valence']), float(row['energy'])))
+            if has_names:
+                names.append(row['name'])
+            if has_artists:
+                artists.append(row.get('artist') or row.get('artists') or '')
+    return track_ids, np.array(features, dtype=np.float32), names or None, artists or None
+
+def synthetic_catalog(directory, tracks, ivf_lists=0, seed=0):
+    """Random catalog for benchmarks and offline testing."""
+    rng = np.random.default_rng(seed)
+    features = rng.random((tracks, len(FEATURES)), dtype=np.float32)
+    alphabet = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+    track_ids = alphabet[rng.integers(len(alphabet), size=(tracks, 22))].view('S22').ravel()
+    return build_index(directory, track_ids, features, ivf_lists=ivf_lists, seed=seed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the track feature index used for emotion-vector recommendations')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build from a CSV with id, valence and energy columns')
+    build.add_argument('--csv', required=True)
+    build.add_argument('--out', required=True)
+    build.add_argument('--ivf-lists', type=int, default=0, help='IVF lists for approximate search (0 = exact only)')
+
+    synthetic = commands.add_parser('synthetic', help='Build a random catalog')
+    synthetic.add_argument('--tracks', type=int, default=100000)
+    synthetic.add_argument('--out', required=True)
+    synthetic.add_argument('--ivf-lists', type=int, default=0)
+    synthetic.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'build':
+        ids, matrix, track_names, track_artists = load_csv(args.csv)
+        build_index(args.out, ids, matrix, track_names, track_artists, ivf_lists=args.ivf_lists)
+    else:
+        synthetic_catalog(args.out, args.tracks, ivf_lists=args.ivf_lists, seed=args.seed)
+    print(f"🎚️ Track feature index ready in {args.out}")